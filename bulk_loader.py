@@ -0,0 +1,427 @@
+import argparse
+import csv
+import os
+import re
+import tempfile
+import time as timer
+from datetime import date, datetime, time
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+from sqlalchemy import CheckConstraint, Column, Index, Integer, MetaData, Table, UniqueConstraint, and_, create_engine, select, text
+from sqlalchemy.dialects import mysql
+from sqlalchemy.exc import DBAPIError
+from models import db
+from controllers.users_controller import iter_password_hashes
+
+BULK_LOAD_CHUNK_SIZE = 5000
+MODES = ("insert", "upsert")
+
+# Connect argument that allows LOAD DATA LOCAL INFILE, per MySQL driver
+LOCAL_INFILE_ARGS = {
+    "mysqldb": {"local_infile": 1},
+    "pymysql": {"local_infile": True},
+    "mysqlconnector": {"allow_local_infile": True},
+}
+
+_TRUE = {"1", "true", "t", "yes", "y"}
+_FALSE = {"0", "false", "f", "no", "n"}
+_IDENTIFIER = re.compile(r"[A-Za-z_]\w*")
+_PASSWORD_HASH = re.compile(r"^(scrypt|pbkdf2):[^$]+\$[^$]+\$[^$]+$")
+
+
+def find_table(name):
+    """The table for a table name (`enrollment`) or model name (`Enrollment`)."""
+    tables = db.metadata.tables
+    if name in tables:
+        return tables[name]
+    for mapper in db.Model.registry.mappers:
+        if mapper.class_.__name__.lower() == name.lower():
+            return mapper.local_table
+    raise ValueError(f"Unknown table or model: {name}")
+
+
+def _converter(column):
+    """Parses one CSV field into the column's Python type; raises ValueError."""
+    try:
+        python_type = column.type.python_type
+    except NotImplementedError:
+        python_type = str
+
+    if python_type is bool:
+        def convert(value):
+            if value.lower() in _TRUE:
+                return True
+            if value.lower() in _FALSE:
+                return False
+            raise ValueError(f"{column.name}: not a boolean: {value!r}")
+    elif python_type in (int, float, Decimal, datetime, date, time):
+        parse = python_type.fromisoformat if python_type in (datetime, date, time) else python_type
+
+        def convert(value):
+            try:
+                return parse(value)
+            except (ValueError, InvalidOperation):
+                raise ValueError(f"{column.name}: not a valid {python_type.__name__}: {value!r}")
+    else:
+        length = getattr(column.type, "length", None)
+        choices = getattr(column.type, "enums", None)
+
+        def convert(value):
+            if length is not None and len(value) > length:
+                raise ValueError(f"{column.name}: longer than {length} characters")
+            if choices and value not in choices:
+                raise ValueError(f"{column.name}: must be one of {', '.join(choices)}")
+            return value
+    return convert
+
+
+def hash_passwords(values):
+    # Plain passwords are hashed like users_controller does; existing hashes are kept
+    plain = [value for value in values if value is not None and not _PASSWORD_HASH.match(value)]
+    hashes = iter_password_hashes(plain)
+    return [next(hashes) if value is not None and not _PASSWORD_HASH.match(value) else value for value in values]
+
+
+# Applied to a whole chunk of already converted values of one column
+COLUMN_TRANSFORMS = {
+    ("user", "password"): hash_passwords,
+}
+
+
+class BulkLoader:
+    """Imports a CSV file into one table through a staging table.
+
+    The file is read in chunks of `chunk_size` rows. Each chunk is
+    1. validated in Python (types, lengths, required columns),
+    2. written to the staging table with a multi-row INSERT, or with
+       LOAD DATA LOCAL INFILE when `load_data` is set,
+    3. checked with set-based SQL against the CHECK constraints, foreign
+       keys and unique keys of the target, and
+    4. merged into the target with one INSERT ... SELECT (with ON DUPLICATE
+       KEY UPDATE in "upsert" mode).
+    When the database refuses the merge (a trigger, say), that chunk is
+    retried one row at a time so only the offending rows are rejected.
+    Rejected rows are written with their line and reason to `rejects_path`.
+    """
+
+    def __init__(self, table, chunk_size=BULK_LOAD_CHUNK_SIZE, mode="insert", load_data=False, rejects_path=None):
+        if mode not in MODES:
+            raise ValueError(f"mode must be one of {', '.join(MODES)}")
+        self.table = table
+        self.chunk_size = chunk_size
+        self.mode = mode
+        self.load_data = load_data
+        self.rejects_path = rejects_path
+        self.stats = []
+        self.rejected = 0
+        self._rejects_file = None
+        self._rejects_writer = None
+
+    def _plan_columns(self, header):
+        unknown = [name for name in header if name not in self.table.c]
+        if unknown:
+            raise ValueError(f"Unknown columns for {self.table.name}: {', '.join(unknown)}")
+
+        self.columns = [self.table.c[name] for name in header]
+        missing = [
+            column.name for column in self.table.columns
+            if column not in self.columns
+            and not column.nullable
+            and column.default is None
+            and column.server_default is None
+            and column is not self.table.autoincrement_column
+        ]
+        if missing:
+            raise ValueError(f"Missing required columns for {self.table.name}: {', '.join(missing)}")
+
+        self.converters = {column.name: _converter(column) for column in self.columns}
+        self.transforms = {
+            name: COLUMN_TRANSFORMS[(self.table.name, name)]
+            for name in header if (self.table.name, name) in COLUMN_TRANSFORMS
+        }
+        loaded = {column.name for column in self.columns}
+        # Unique keys whose columns all come from the file; those are the ones worth checking
+        keys = [tuple(column.name for column in self.table.primary_key.columns)]
+        keys += [tuple(column.name for column in constraint.columns) for constraint in self.table.constraints
+                 if isinstance(constraint, UniqueConstraint)]
+        keys += [(column.name,) for column in self.table.columns if column.unique]
+        keys += [tuple(column.name for column in index.columns) for index in self.table.indexes if index.unique]
+        self.unique_keys = [key for key in dict.fromkeys(keys) if key and set(key) <= loaded]
+
+    def _create_staging(self, conn):
+        # A plain table rather than TEMPORARY: MySQL can't open a temporary table
+        # twice in one query, and the duplicate check joins staging with itself
+        name = f"_staging_{self.table.name}_{os.getpid()}"
+        self.staging = Table(
+            name, MetaData(),
+            Column("_row", Integer, primary_key=True, autoincrement=False),
+            *[Column(column.name, column.type, nullable=True) for column in self.columns],
+        )
+        for i, key in enumerate(self.unique_keys):
+            Index(f"ix{i}_{name}", *[self.staging.c[column] for column in key])
+        self.staging.drop(conn, checkfirst=True)
+        self.staging.create(conn)
+        conn.commit()
+
+    def _validate(self, chunk):
+        rows, rejects = [], []
+        for line, raw in chunk:
+            row = {"_row": line}
+            try:
+                for column in self.columns:
+                    value = (raw.get(column.name) or "").strip()
+                    if not value:
+                        if not column.nullable and column is not self.table.autoincrement_column:
+                            raise ValueError(f"{column.name}: required")
+                        row[column.name] = None
+                    else:
+                        row[column.name] = self.converters[column.name](value)
+            except ValueError as e:
+                rejects.append((line, str(e)))
+                continue
+            rows.append(row)
+
+        for name, transform in self.transforms.items():
+            for row, value in zip(rows, transform([row[name] for row in rows])):
+                row[name] = value
+        return rows, rejects
+
+    def _stage(self, conn, rows):
+        if not rows:
+            return
+        if not self.load_data:
+            conn.execute(self.staging.insert(), rows)
+            return
+
+        names = ["_row"] + [column.name for column in self.columns]
+        with tempfile.NamedTemporaryFile("w", suffix=".csv", newline="", encoding="utf-8", delete=False) as f:
+            writer = csv.writer(f, lineterminator="\n")
+            for row in rows:
+                writer.writerow([_infile_value(row[name]) for name in names])
+        try:
+            quote = conn.dialect.identifier_preparer.quote
+            conn.execute(text(
+                f"LOAD DATA LOCAL INFILE :path INTO TABLE {quote(self.staging.name)} CHARACTER SET utf8mb4 "
+                "FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '\"' ESCAPED BY '\\\\' "
+                "LINES TERMINATED BY '\\n' "
+                f"({', '.join(quote(name) for name in names)})"
+            ), {"path": f.name})
+        finally:
+            os.remove(f.name)
+
+    def _check(self, conn):
+        """Rejects staged rows the target would refuse, with set-based queries.
+        Returns (line, reason) pairs; the rows are removed from staging."""
+        staging = self.staging
+        checks = []
+
+        for constraint in self.table.constraints:
+            if not isinstance(constraint, CheckConstraint):
+                continue
+            condition = str(constraint.sqltext)
+            referenced = set(_IDENTIFIER.findall(condition)) & set(self.table.c.keys())
+            if referenced and referenced <= set(staging.c.keys()):
+                checks.append((
+                    select(staging.c._row).where(text(f"NOT ({condition})")),
+                    f"violates CHECK ({condition})",
+                ))
+
+        for fk in self.table.foreign_key_constraints:
+            if not all(name in staging.c for name in fk.column_keys):
+                continue
+            referred = fk.referred_table.alias("r")
+            pairs = [(staging.c[element.parent.name], referred.c[element.column.name]) for element in fk.elements]
+            join = and_(*[local == remote for local, remote in pairs])
+            checks.append((
+                select(staging.c._row)
+                .select_from(staging.outerjoin(referred, join))
+                .where(*[local.isnot(None) for local, _ in pairs], pairs[0][1].is_(None)),
+                f"{', '.join(fk.column_keys)}: no matching {fk.referred_table.name}",
+            ))
+
+        for key in self.unique_keys:
+            if self.mode == "insert":
+                # A later row repeating a key from the same chunk
+                earlier = staging.alias("earlier")
+                checks.append((
+                    select(staging.c._row).distinct().select_from(staging.join(earlier, and_(
+                        *[staging.c[name] == earlier.c[name] for name in key],
+                        earlier.c._row < staging.c._row,
+                    ))),
+                    f"{', '.join(key)}: duplicated in file",
+                ))
+                target = self.table.alias("t")
+                checks.append((
+                    select(staging.c._row).select_from(staging.join(target, and_(
+                        *[staging.c[name] == target.c[name] for name in key]
+                    ))),
+                    f"{', '.join(key)}: already exists",
+                ))
+
+        rejects = []
+        for query, reason in checks:
+            lines = conn.execute(query).scalars().all()
+            if lines:
+                conn.execute(staging.delete().where(staging.c._row.in_(lines)))
+                rejects += [(line, reason) for line in lines]
+        conn.commit()
+        return rejects
+
+    def _merge_statement(self, where=None):
+        # from_select() adds the Python-side defaults of the columns the file leaves out
+        names = [column.name for column in self.columns]
+        source = select(*[self.staging.c[name] for name in names]).order_by(self.staging.c._row)
+        if where is not None:
+            source = source.where(where)
+
+        if self.mode == "insert":
+            return self.table.insert().from_select(names, source)
+        statement = mysql.insert(self.table).from_select(names, source)
+        keys = {column.name for column in self.table.primary_key.columns}
+        updates = [name for name in names if name not in keys] or names
+        return statement.on_duplicate_key_update({name: statement.inserted[name] for name in updates})
+
+    def _merge(self, conn, count):
+        """Merges the `count` staged rows into the target; returns (rows merged, rejects)."""
+        try:
+            conn.execute(self._merge_statement())
+            conn.commit()
+            return count, []
+        except DBAPIError:
+            conn.rollback()
+
+        merged, rejects = 0, []
+        for line in conn.execute(select(self.staging.c._row).order_by(self.staging.c._row)).scalars().all():
+            try:
+                conn.execute(self._merge_statement(self.staging.c._row == line))
+                conn.commit()
+                merged += 1
+            except DBAPIError as e:
+                conn.rollback()
+                rejects.append((line, str(e.orig)))
+        return merged, rejects
+
+    def _reject(self, rejects, chunk, header):
+        if not rejects:
+            return
+        if self._rejects_writer is None:
+            self._rejects_file = open(self.rejects_path, "w", newline="", encoding="utf-8")
+            self._rejects_writer = csv.writer(self._rejects_file)
+            self._rejects_writer.writerow(["line", "reason"] + header)
+        raw_rows = dict(chunk)
+        for line, reason in sorted(rejects):
+            self._rejects_writer.writerow([line, reason] + [raw_rows[line].get(name, "") for name in header])
+        self.rejected += len(rejects)
+
+    def load(self, path):
+        if self.rejects_path is None:
+            self.rejects_path = os.path.splitext(path)[0] + ".rejects.csv"
+        if self.mode == "upsert" and db.engine.dialect.name != "mysql":
+            raise ValueError("upsert mode needs MySQL")
+
+        engine = db.engine
+        if self.load_data:
+            if engine.dialect.name != "mysql":
+                raise ValueError("LOAD DATA LOCAL INFILE needs MySQL")
+            engine = create_engine(engine.url, connect_args=LOCAL_INFILE_ARGS.get(engine.dialect.driver, {}))
+
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            reader = csv.DictReader(f)
+            header = [name.strip() for name in reader.fieldnames or []]
+            reader.fieldnames = header
+            self._plan_columns(header)
+
+            with engine.connect() as conn:
+                self._create_staging(conn)
+                try:
+                    rows = ((reader.line_num, raw) for raw in reader)
+                    while chunk := list(islice(rows, self.chunk_size)):
+                        self._load_chunk(conn, chunk, header)
+                finally:
+                    conn.rollback()
+                    self.staging.drop(conn, checkfirst=True)
+                    conn.commit()
+                    if self._rejects_file is not None:
+                        self._rejects_file.close()
+
+        if engine is not db.engine:
+            engine.dispose()
+        return self.stats
+
+    def _load_chunk(self, conn, chunk, header):
+        start = timer.perf_counter()
+        rows, rejects = self._validate(chunk)
+
+        staged = timer.perf_counter()
+        self._stage(conn, rows)
+        conn.commit()
+
+        checked = timer.perf_counter()
+        refused = self._check(conn)
+        merging = timer.perf_counter()
+        merged, failed = self._merge(conn, len(rows) - len(refused))
+        rejects += refused
+        rejects += failed
+        conn.execute(self.staging.delete())
+        conn.commit()
+        end = timer.perf_counter()
+
+        self._reject(rejects, chunk, header)
+        self.stats.append({
+            "rows": len(chunk),
+            "merged": merged,
+            "rejected": len(rejects),
+            "validate_s": staged - start,
+            "stage_s": checked - staged,
+            "check_s": merging - checked,
+            "merge_s": end - merging,
+            "total_s": end - start,
+        })
+        self.report_chunk(len(self.stats), self.stats[-1])
+
+    def report_chunk(self, number, stats):
+        if number == 1:
+            print(f"{'chunk':>6}{'rows':>9}{'merged':>9}{'rejected':>10}{'validate':>10}{'stage':>8}{'check':>8}{'merge':>8}{'rows/s':>10}")
+        rate = stats["rows"] / stats["total_s"] if stats["total_s"] else float("inf")
+        print(
+            f"{number:>6}{stats['rows']:>9}{stats['merged']:>9}{stats['rejected']:>10}"
+            f"{stats['validate_s']:>10.2f}{stats['stage_s']:>8.2f}{stats['check_s']:>8.2f}{stats['merge_s']:>8.2f}{rate:>10.0f}"
+        )
+
+    def report(self):
+        rows = sum(chunk["rows"] for chunk in self.stats)
+        merged = sum(chunk["merged"] for chunk in self.stats)
+        elapsed = sum(chunk["total_s"] for chunk in self.stats)
+        rate = rows / elapsed if elapsed else float("inf")
+        print(f"{self.table.name}: {rows} rows read, {merged} merged, {self.rejected} rejected in {elapsed:.2f}s ({rate:.0f} rows/s)")
+        if self.rejected:
+            print(f"Rejected rows written to {self.rejects_path}")
+
+
+def _infile_value(value):
+    # LOAD DATA reads \N as NULL and uses backslash as its escape character
+    if value is None:
+        return "\\N"
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, str):
+        return value.replace("\\", "\\\\")
+    return value
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import a CSV file into a table through a staging table.")
+    parser.add_argument("table", help="table or model name, e.g. enrollment or Course")
+    parser.add_argument("csv", help="CSV file whose header names the columns")
+    parser.add_argument("--chunk-size", type=int, default=BULK_LOAD_CHUNK_SIZE, help="rows validated and merged at a time")
+    parser.add_argument("--mode", choices=MODES, default="insert", help="upsert updates rows whose key already exists (MySQL)")
+    parser.add_argument("--load-data", action="store_true", help="stage with LOAD DATA LOCAL INFILE instead of multi-row INSERT")
+    parser.add_argument("--rejects", help="where to write rejected rows (default: <csv>.rejects.csv)")
+    args = parser.parse_args()
+
+    from main import create_app
+
+    with create_app(web=False).app_context():
+        loader = BulkLoader(find_table(args.table), args.chunk_size, args.mode, args.load_data, args.rejects)
+        loader.load(args.csv)
+        loader.report()
@@ -1,20 +1,169 @@
-from flask_login import UserMixin, LoginManager, login_user, logout_user, current_user
-from models import User  # your SQLAlchemy User model
-from main import app
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from enum import IntFlag
+from flask_login import UserMixin, AnonymousUserMixin, LoginManager, login_user, logout_user, current_user
+from models import db, User, Admin, Worker, Student, Professor, Conductor, Secretary, Maintenancer  # your SQLAlchemy User model
 from functools import wraps
 from flask import abort
-from sqlalchemy.orm import joinedload
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+
+class Role(IntFlag):
+    ADMIN = 1
+    WORKER = 2
+    PROFESSOR = 4
+    CONDUCTOR = 8
+    SECRETARY = 16
+    MAINTENANCER = 32
+    STUDENT = 64
+
+
+def roles_mask(*roles):
+    mask = Role(0)
+    for role in roles:
+        mask |= Role[role.upper()]
+    return mask
+
+
+@dataclass(frozen=True)
+class Principal(UserMixin):
+    """Immutable snapshot of the logged in user, safe to share between requests."""
+    id: int
+    name: str
+    email: str
+    roles: Role = Role(0)
+
+    def has_role(self, *roles):
+        """True if the user has any of the given roles (e.g. has_role("admin", "secretary"))."""
+        return bool(self.roles & roles_mask(*roles))
+
+
+class AnonymousPrincipal(AnonymousUserMixin):
+    roles = Role(0)
+
+    def has_role(self, *roles):
+        return False
+
 
 login_manager = LoginManager()
-login_manager.init_app(app)
-login_manager.login_view = "login_get"
+login_manager.login_view = "main.login_get"
+login_manager.anonymous_user = AnonymousPrincipal
+
+
+class PrincipalCache:
+    """Per-process LRU cache of principals with a time to live."""
+
+    def __init__(self, max_size=1024, ttl=60):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            expires_at, principal = entry
+            if expires_at < time.monotonic():
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return principal
+
+    def put(self, principal):
+        with self._lock:
+            self._entries[principal.id] = (time.monotonic() + self.ttl, principal)
+            self._entries.move_to_end(principal.id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+principal_cache = PrincipalCache(
+    max_size=int(os.getenv("PRINCIPAL_CACHE_SIZE", 1024)),
+    ttl=float(os.getenv("PRINCIPAL_CACHE_TTL", 60))
+)
+
+
+def load_principal(user_id):
+    """Resolves the user and every role it holds in a single query."""
+    row = db.session.execute(
+        select(
+            User.id,
+            User.name,
+            User.email,
+            Admin.user_id.label("admin"),
+            Worker.id.label("worker"),
+            Professor.id.label("professor"),
+            Conductor.id.label("conductor"),
+            Secretary.id.label("secretary"),
+            Maintenancer.id.label("maintenancer"),
+            Student.id.label("student")
+        )
+        .outerjoin(Admin, Admin.user_id == User.id)
+        .outerjoin(Worker, Worker.user_id == User.id)
+        .outerjoin(Professor, Professor.worker_id == Worker.id)
+        .outerjoin(Conductor, Conductor.professor_id == Professor.id)
+        .outerjoin(Secretary, Secretary.worker_id == Worker.id)
+        .outerjoin(Maintenancer, Maintenancer.worker_id == Worker.id)
+        .outerjoin(Student, Student.user_id == User.id)
+        .where(User.id == user_id)
+    ).first()
+    if row is None:
+        return None
+
+    roles = Role(0)
+    for role in Role:
+        if getattr(row, role.name.lower()) is not None:
+            roles |= role
+
+    return Principal(id=row.id, name=row.name, email=row.email, roles=roles)
+
+
+def get_principal(user_id):
+    principal = principal_cache.get(user_id)
+    if principal is None:
+        principal = load_principal(user_id)
+        if principal is not None:
+            principal_cache.put(principal)
+    return principal
+
+
+# Role rows are written rarely, so any committed change to them drops the whole cache
+ROLE_MODELS = (Admin, Worker, Professor, Conductor, Secretary, Maintenancer, Student)
+
+@event.listens_for(Session, "after_flush")
+def _track_role_writes(session, flush_context):
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, ROLE_MODELS):
+            session.info["principal_cache_stale"] = True
+            return
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_on_commit(session):
+    if session.info.pop("principal_cache_stale", False):
+        principal_cache.clear()
+
+@event.listens_for(Session, "after_rollback")
+def _discard_on_rollback(session):
+    session.info.pop("principal_cache_stale", None)
+
 
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.options(
-        joinedload(User.admin),
-        joinedload(User.worker)
-    ).filter_by(id=int(user_id)).first()
+    return get_principal(int(user_id))
 
 def authenticate(email, password):
     user = User.query.filter_by(email=email).first()
@@ -23,7 +172,7 @@ def authenticate(email, password):
     return None
 
 def login(user):
-    login_user(user)
+    login_user(get_principal(user.id))
 
 def logout():
     logout_user()
@@ -32,25 +181,15 @@ def is_logged_in():
     return current_user.is_authenticated
 
 def roles_required(*roles):
+    required = roles_mask(*roles)
+
     def decorator(f):
         @wraps(f)
         def decorated_function(*args, **kwargs):
             if not current_user.is_authenticated:
                 abort(401)  # Unauthorized
 
-            has_role = False
-
-            if "admin" in roles and hasattr(current_user, "admin") and current_user.admin is not None:
-                has_role = True
-
-            if "secretary" in roles:
-                # Check if user has a worker and that worker's role is secretary
-                if hasattr(current_user, "worker") and current_user.worker is not None:
-                    # Adjust the attribute name for the worker's role field here
-                    if current_user.worker.secretary is not None:
-                        has_role = True
-
-            if not has_role:
+            if not current_user.roles & required:
                 abort(403)  # Forbidden
 
             return f(*args, **kwargs)
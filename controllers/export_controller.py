@@ -0,0 +1,91 @@
+import csv
+import io
+import json
+import os
+from flask import Response, stream_with_context
+from models import db
+
+# Rows pulled from the server-side cursor per fetch
+EXPORT_FETCH_SIZE = 1000
+# Rows encoded per chunk sent to the client
+EXPORT_CHUNK_ROWS = 500
+# Query Maker exports are capped like the page, just much higher
+QUERY_EXPORT_ROW_LIMIT = int(os.getenv("QUERYMAKER_EXPORT_ROW_LIMIT", 1_000_000))
+
+EXPORT_FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson; charset=utf-8",
+}
+
+
+class ExportIncomplete(RuntimeError):
+    pass
+
+
+def _json_default(value):
+    return value.isoformat() if hasattr(value, "isoformat") else str(value)
+
+
+def encode_csv(keys, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(keys)
+    # Send the header right away, then one chunk per EXPORT_CHUNK_ROWS rows
+    yield buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    for count, row in enumerate(rows, 1):
+        writer.writerow(row)
+        if count % EXPORT_CHUNK_ROWS == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def encode_ndjson(keys, rows):
+    # Keys are encoded once; each line is assembled from the row tuple directly
+    prefixes = [json.dumps(str(key)) + ":" for key in keys]
+    chunk = []
+    for row in rows:
+        chunk.append("{" + ",".join(
+            prefix + json.dumps(value, default=_json_default) for prefix, value in zip(prefixes, row)
+        ) + "}\n")
+        if len(chunk) >= EXPORT_CHUNK_ROWS:
+            yield "".join(chunk)
+            chunk.clear()
+    yield "".join(chunk)
+
+
+ENCODERS = {"csv": encode_csv, "ndjson": encode_ndjson}
+
+
+def export_rows(keys, rows, fmt):
+    """Encodes an iterable of row tuples as chunks of CSV or NDJSON text."""
+    return ENCODERS[fmt](list(keys), rows)
+
+
+def complete_rows(results):
+    """Rows of a Query Maker result; raises once they stop early (error or row
+    limit), so the response is cut off instead of ending like a complete file."""
+    yield from results
+    if results.error:
+        raise ExportIncomplete(f"Export aborted after {results.rows_sent} rows: {results.error}")
+    if results.truncated:
+        raise ExportIncomplete(f"Export stopped at the {results.row_limit} row limit")
+
+
+def export_statement(statement, fmt):
+    """Runs a Core select on its own connection with a server-side cursor and
+    yields the encoded rows; memory stays flat however many rows there are."""
+    with db.engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=EXPORT_FETCH_SIZE).execute(statement)
+        yield from export_rows(result.keys(), result, fmt)
+
+
+def export_response(chunks, fmt, filename):
+    return Response(
+        stream_with_context(chunks),
+        content_type=EXPORT_FORMATS[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{fmt}"'}
+    )
@@ -1,35 +1,126 @@
 from datetime import time
-from main import db
-from models import Presentation, Amphitheater, Conductor, Student
-from sqlalchemy.orm import joinedload
+from models import db, Presentation, Amphitheater, Conductor, Student, Dependency, Professor, Worker, User, Participation
+from controllers.query_helpers import escape_like, encode_cursor, decode_cursor
+from controllers.reference_controller import reference_cache
+from sqlalchemy import func, select, insert, delete, and_, or_, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import joinedload, aliased
 
+PRESENTATIONS_PAGE_SIZE = 50
+STUDENT_SEARCH_PAGE_SIZE = 20
+STUDENT_SEARCH_MAX_PAGE_SIZE = 100
+# MySQL cuts GROUP_CONCAT at group_concat_max_len (1024 bytes by default)
+# without any error, which would chop the student list of big presentations
+GROUP_CONCAT_MAX_LEN = 1024 * 1024
 
-def validate_presentation_data(title, date, level, guest_number, amphitheater_id, conductor_id, student_ids):
-    if date.weekday() not in (5, 6):  # 5 = Saturday, 6 = Sunday
-        return None, "Presentations can only be scheduled on weekends."
-    if not (time(14, 0) <= date.time() <= time(22, 0)):
-        return None, "Presentation time must be between 14:00 and 22:00."
 
-    amphitheater = Amphitheater.query.get(amphitheater_id)
-    if not amphitheater:
-        return None, "Amphitheater not found."
-    if amphitheater.guest_capacity < guest_number:
-        return None, "Amphitheater cannot hold the specified guest number."
+@event.listens_for(Engine, "connect")
+def _raise_group_concat_limit(dbapi_conn, connection_record):
+    backend = type(dbapi_conn).__module__.split(".")[0].lower()
+    if backend not in ("mysqldb", "pymysql", "mysql"):
+        return
+    cursor = dbapi_conn.cursor()
+    try:
+        cursor.execute(f"SET SESSION group_concat_max_len = {GROUP_CONCAT_MAX_LEN}")
+    finally:
+        cursor.close()
 
-    conductor = Conductor.query.get(conductor_id)
-    if not conductor:
-        return None, "Conductor not found."
-    if conductor.level < level:
-        return None, "Conductor level is too low for this presentation."
 
-    students = Student.query.filter(Student.id.in_(student_ids)).all()
-    if len(students) != len(student_ids):
-        return None, "Some students not found."
-    for student in students:
-        if student.level < level:
-            return None, f"Student {student.id} level is too low for this presentation."
+def _error(field, message):
+    return {"field": field, "message": message}
 
-    return (amphitheater, conductor, students), None
+
+def validate_presentation_data(title, date, level, guest_number, amphitheater_id, conductor_id, student_ids):
+    """Checks every presentation rule and returns all violations at once.
+
+    Amphitheater capacity and conductor level come from the reference cache
+    and the level of each student from a single query. Each error is a dict
+    with the offending form field and a message; an empty list means the data
+    is valid.
+    """
+    errors = []
+    if date.weekday() not in (5, 6):  # 5 = Saturday, 6 = Sunday
+        errors.append(_error("date", "Presentations can only be scheduled on weekends."))
+    if not (time(14, 0) <= date.time() <= time(22, 0)):
+        errors.append(_error("date", "Presentation time must be between 14:00 and 22:00."))
+
+    amphitheater = reference_cache.amphitheater(amphitheater_id)
+    if amphitheater is None:
+        errors.append(_error("amphitheater_id", "Amphitheater not found."))
+    elif amphitheater.capacity < guest_number:
+        errors.append(_error("guest_number", "Amphitheater cannot hold the specified guest number."))
+
+    conductor = reference_cache.conductor(conductor_id)
+    if conductor is None:
+        errors.append(_error("conductor_id", "Conductor not found."))
+    elif conductor.level < level:
+        errors.append(_error("conductor_id", "Conductor level is too low for this presentation."))
+
+    student_ids = list(dict.fromkeys(student_ids))
+    levels = dict(db.session.execute(
+        select(Student.id, Student.level).where(Student.id.in_(student_ids))
+    ).all()) if student_ids else {}
+
+    missing = [sid for sid in student_ids if sid not in levels]
+    if missing:
+        errors.append(_error("student_ids", f"Students not found: {', '.join(map(str, missing))}."))
+    for sid in student_ids:
+        if sid in levels and levels[sid] < level:
+            errors.append(_error("student_ids", f"Student {sid} level is too low for this presentation."))
+
+    return errors
+
+
+def _set_participants(presentation_id, student_ids):
+    db.session.execute(delete(Participation).where(Participation.presentation_id == presentation_id))
+    if student_ids:
+        db.session.execute(insert(Participation), [
+            {"presentation_id": presentation_id, "student_id": sid} for sid in dict.fromkeys(student_ids)
+        ])
+
+
+def search_students(name_prefix=None, min_level=0, after=None, per_page=STUDENT_SEARCH_PAGE_SIZE):
+    """Students eligible for a presentation, for the form's student picker.
+
+    Walks the `user.name` index in (name, user id) order with a keyset cursor
+    and joins each user to its student through the unique `student.user_id`
+    key, so a page never scans more than the matching names.
+    Returns (students, next_cursor); each student row has id, name, level
+    and user_id.
+    """
+    per_page = max(1, min(int(per_page), STUDENT_SEARCH_MAX_PAGE_SIZE))
+    query = db.session.query(
+        Student.id, User.name, Student.level, User.id.label("user_id")
+    ).join(User, Student.user_id == User.id).filter(Student.level >= min_level)
+
+    if name_prefix:
+        query = query.filter(User.name.like(escape_like(name_prefix) + "%", escape="\\"))
+
+    after = decode_cursor(after)
+    if after:
+        name, user_id = after
+        query = query.filter(or_(User.name > name, and_(User.name == name, User.id > user_id)))
+
+    # Fetch one extra row to know whether there is another page
+    rows = query.order_by(User.name.asc(), User.id.asc()).limit(per_page + 1).all()
+    students = rows[:per_page]
+    next_cursor = encode_cursor(students[-1].name, students[-1].user_id) if len(rows) > per_page else None
+    return students, next_cursor
+
+
+def get_students_by_ids(student_ids):
+    """(id, name, level) of the given students, to render what a form already selected."""
+    if not student_ids:
+        return []
+    return db.session.query(
+        Student.id, User.name, Student.level
+    ).join(User, Student.user_id == User.id).filter(Student.id.in_(student_ids)).order_by(User.name).all()
+
+
+def get_presentation_student_ids(presentation_id):
+    return [sid for sid, in db.session.query(Participation.student_id).filter(
+        Participation.presentation_id == presentation_id
+    )]
 
 
 def get_all_presentations():
@@ -40,25 +131,84 @@ def get_all_presentations():
     ).all()
 
 
+def presentation_summaries_query(date_from=None, date_to=None):
+    """Read model for the presentations list and export.
+
+    Venue name, conductor name and the comma separated student names are
+    resolved in a single statement, so a page costs one query no matter how
+    many presentations or participants there are.
+    """
+    conductor_user = aliased(User)
+    student_user = aliased(User)
+
+    query = db.session.query(
+        Presentation.id,
+        Presentation.title,
+        Presentation.date,
+        Presentation.level,
+        Presentation.guest_number,
+        Dependency.name.label("venue"),
+        conductor_user.name.label("conductor"),
+        func.aggregate_strings(student_user.name, ", ").label("student_names")
+    ).outerjoin(
+        Amphitheater, Presentation.amphitheater_id == Amphitheater.id
+    ).outerjoin(
+        Dependency, Amphitheater.dependency_id == Dependency.id
+    ).outerjoin(
+        Conductor, Presentation.conductor_id == Conductor.id
+    ).outerjoin(
+        Professor, Conductor.professor_id == Professor.id
+    ).outerjoin(
+        Worker, Professor.worker_id == Worker.id
+    ).outerjoin(
+        conductor_user, Worker.user_id == conductor_user.id
+    ).outerjoin(
+        Participation, Presentation.id == Participation.presentation_id
+    ).outerjoin(
+        Student, Participation.student_id == Student.id
+    ).outerjoin(
+        student_user, Student.user_id == student_user.id
+    )
+
+    if date_from:
+        query = query.filter(Presentation.date >= date_from)
+    if date_to:
+        query = query.filter(Presentation.date < date_to)
+
+    return query.group_by(
+        Presentation.id, Dependency.name, conductor_user.name
+    ).order_by(
+        Presentation.date.asc(), Presentation.id.asc()
+    )
+
+
+def get_presentation_summaries(date_from=None, date_to=None, page=1, per_page=PRESENTATIONS_PAGE_SIZE):
+    """One page of presentation_summaries_query(). Returns (rows, has_next)."""
+    page = max(1, int(page))
+    rows = presentation_summaries_query(date_from, date_to).limit(per_page + 1).offset((page - 1) * per_page).all()
+
+    return rows[:per_page], len(rows) > per_page
+
+
 def create_presentation(title, date, level, guest_number, amphitheater_id, conductor_id, student_ids):
-    validated, error = validate_presentation_data(
+    errors = validate_presentation_data(
         title, date, level, guest_number, amphitheater_id, conductor_id, student_ids
     )
-    if error:
-        return None, error
-
-    amphitheater, conductor, students = validated
+    if errors:
+        return None, errors
 
     presentation = Presentation(
         title=title,
         date=date,
         level=level,
         guest_number=guest_number,
-        amphitheater_id=amphitheater.id,
-        conductor_id=conductor.id
+        amphitheater_id=amphitheater_id,
+        conductor_id=conductor_id
     )
-    presentation.students.extend(students)
     db.session.add(presentation)
+    db.session.flush()
+    # Participants were validated by id, so link them without loading the students
+    _set_participants(presentation.id, student_ids)
     db.session.commit()
     return presentation, None
 
@@ -68,21 +218,19 @@ def get_presentation(presentation_id):
 
 
 def update_presentation(presentation, title, date, level, guest_number, amphitheater_id, conductor_id, student_ids):
-    validated, error = validate_presentation_data(
+    errors = validate_presentation_data(
         title, date, level, guest_number, amphitheater_id, conductor_id, student_ids
     )
-    if error:
-        return None, error
-
-    amphitheater, conductor, students = validated
+    if errors:
+        return None, errors
 
     presentation.title = title
     presentation.date = date
     presentation.level = level
     presentation.guest_number = guest_number
-    presentation.amphitheater_id = amphitheater.id
-    presentation.conductor_id = conductor.id
-    presentation.students = students  # overwrite relationship
+    presentation.amphitheater_id = amphitheater_id
+    presentation.conductor_id = conductor_id
+    _set_participants(presentation.id, student_ids)  # overwrite participants
     db.session.commit()
     return presentation, None
 
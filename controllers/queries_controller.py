@@ -1,8 +1,28 @@
-from main import db
-from models import Course
-from sqlalchemy import func
+from models import db, Course
+from views import VIEW_TABLES
+from sqlalchemy import func, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import DBAPIError
 from sqlalchemy.sql import text
+from collections import OrderedDict, defaultdict, deque
+from datetime import datetime
+from functools import partial
+import json
+import os
 import re
+import threading
+import time
+
+QUERY_ROW_LIMIT = int(os.getenv("QUERYMAKER_ROW_LIMIT", 1000))
+QUERY_FETCH_SIZE = 500
+QUERY_TIMEOUT_MS = int(os.getenv("QUERYMAKER_TIMEOUT_MS", 5000))
+QUERY_MAX_CONCURRENT = int(os.getenv("QUERYMAKER_MAX_CONCURRENT", 4))
+QUERY_MAX_PER_USER = int(os.getenv("QUERYMAKER_MAX_PER_USER", 2))
+QUERY_QUEUE_TIMEOUT = 2
+# Exports run on their own pool with a longer timeout, one at a time per user
+QUERY_EXPORT_TIMEOUT_MS = int(os.getenv("QUERYMAKER_EXPORT_TIMEOUT_MS", 300_000))
+QUERY_EXPORT_MAX_CONCURRENT = int(os.getenv("QUERYMAKER_EXPORT_MAX_CONCURRENT", 2))
+QUERY_HISTORY_SIZE = 20
 
 def get_courses_with_available_spots():
     query = text(PREDEFINED_QUERIES["CONSULTA 01: Cursos com vagas disponíveis"])
@@ -18,23 +38,539 @@ def get_students_never_participated():
     return [dict(row) for row in result.mappings()]
 
 
-def execute_query(sql_query):
+_SQL_TOKENS = re.compile(r"""('(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*"|`[^`]*`)|\s+""")
+_NON_DETERMINISTIC = re.compile(r"\b(now|rand|uuid|curdate|curtime|current_date|current_time|current_timestamp|sysdate|unix_timestamp)\b", re.IGNORECASE)
+_READ_ONLY_PREFIXES = ("select", "explain", "show", "describe", "desc", "set")
+
+
+def normalize_sql(sql_query):
+    """Collapses whitespace outside string literals and drops the trailing semicolon."""
+    normalized = _SQL_TOKENS.sub(lambda m: m.group(1) or " ", sql_query)
+    return normalized.strip().rstrip(";").strip()
+
+
+def tables_in_sql(sql_query):
+    """Tables (and the tables behind views) named anywhere in the statement."""
+    names = set(re.findall(r"[A-Za-z_][A-Za-z0-9_]*", sql_query.lower()))
+    tables = names & set(db.metadata.tables)
+    for view in names & set(VIEW_TABLES):
+        tables |= VIEW_TABLES[view]
+    return tables
+
+
+class QueryResult:
+    """What the Query Maker page and export read from a query result.
+
+    Iterating yields row tuples; total_count() is the full row count and
+    close() releases whatever the result holds.
+    """
+
+    keys = ()
+    rows_sent = 0
+    truncated = False
+    error = None
+    explain_plan = None
+    profile = None
+
+    def __iter__(self):
+        raise NotImplementedError
+
+    def total_count(self):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class CachedResult(QueryResult):
+    """A finished query result kept in memory."""
+
+    def __init__(self, keys, rows, truncated, total, explain_plan):
+        self.keys = keys
+        self.rows = rows
+        self.rows_sent = len(rows)
+        self.truncated = truncated
+        self.explain_plan = explain_plan
+        self._total = total
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def total_count(self):
+        return self._total
+
+
+class ResultCache:
+    """Per-process LRU cache of Query Maker results, invalidated per table.
+
+    Every table carries a version number. A result is only stored if none of
+    the tables it reads changed while it was being computed, and any write to
+    a table drops every cached result that reads it.
+    Only writes made by this process are seen: changes from other workers or
+    from bulk_loader.py can be served stale until the entry's ttl runs out.
+    """
+
+    def __init__(self, max_entries=128, max_rows=100_000, ttl=300):
+        self.max_entries = max_entries
+        self.max_rows = max_rows
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._versions = defaultdict(int)
+        self._rows = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, _, result = entry
+            if expires_at < time.monotonic():
+                self._drop(key)
+                return None
+            self._entries.move_to_end(key)
+            return result
+
+    def snapshot(self, tables):
+        with self._lock:
+            return {table: self._versions[table] for table in tables}
+
+    def put(self, key, snapshot, result):
+        with self._lock:
+            if any(self._versions[table] != version for table, version in snapshot.items()):
+                return
+            if result.rows_sent > self.max_rows:
+                return
+            self._drop(key)
+            self._entries[key] = (time.monotonic() + self.ttl, set(snapshot), result)
+            self._rows += result.rows_sent
+            while len(self._entries) > self.max_entries or self._rows > self.max_rows:
+                self._drop(next(iter(self._entries)))
+
+    def invalidate_tables(self, tables):
+        with self._lock:
+            for table in tables:
+                self._versions[table] += 1
+            stale = [key for key, (_, read, _) in self._entries.items() if read & tables]
+            for key in stale:
+                self._drop(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._rows = 0
+
+    def _drop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._rows -= entry[2].rows_sent
+
+
+query_cache = ResultCache(
+    max_entries=int(os.getenv("QUERY_CACHE_SIZE", 128)),
+    max_rows=int(os.getenv("QUERY_CACHE_MAX_ROWS", 100_000)),
+    ttl=int(os.getenv("QUERY_CACHE_TTL", 300))
+)
+
+# Tables changed by triggers as a side effect of writing another table (see triggers.py)
+TRIGGER_WRITES = {
+    "conductor": {"worker"},
+    "enrollment": {"course"},
+    "student": {"course", "student_participation_stats"},
+    "user": {"course"},
+    "participation": {"student_participation_stats"},
+    "presentation": {"student_participation_stats"},
+    "amphitheater": {"student_participation_stats"},
+    "dependency": {"student_participation_stats"},
+}
+
+
+
+def _cascade_writes(metadata):
+    """Tables changed by ON DELETE / ON UPDATE actions of foreign keys into each table."""
+    writes = defaultdict(set)
+    for table in metadata.tables.values():
+        for fk in table.foreign_keys:
+            if fk.ondelete or fk.onupdate:
+                writes[fk.column.table.name].add(table.name)
+    return writes
+
+
+CASCADE_WRITES = _cascade_writes(db.metadata)
+
+
+def tables_written_by(tables):
+    """The given tables plus everything their triggers and FK cascades may
+    change, followed transitively (presentation -> rehearsal, participation ->
+    student_participation_stats, ...)."""
+    written = set(tables)
+    pending = list(written)
+    while pending:
+        table = pending.pop()
+        for dependent in TRIGGER_WRITES.get(table, set()) | CASCADE_WRITES.get(table, set()):
+            if dependent not in written:
+                written.add(dependent)
+                pending.append(dependent)
+    return written
+
+
+# Every statement goes through the engine, so ORM flushes, bulk inserts and raw
+# SQL from the controllers are all seen here. Tables are invalidated as soon as
+# the write runs and again on commit, so a result read in between is not kept.
+@event.listens_for(Engine, "before_cursor_execute")
+def _track_table_writes(conn, cursor, statement, parameters, context, executemany):
+    if statement.lstrip().lower().startswith(_READ_ONLY_PREFIXES):
+        return
+    tables = tables_written_by(tables_in_sql(statement))
+    if tables:
+        conn.info.setdefault("written_tables", set()).update(tables)
+        query_cache.invalidate_tables(tables)
+
+@event.listens_for(Engine, "commit")
+def _invalidate_on_commit(conn):
+    tables = conn.info.pop("written_tables", None)
+    if tables:
+        query_cache.invalidate_tables(tables)
+
+@event.listens_for(Engine, "rollback")
+def _forget_on_rollback(conn):
+    conn.info.pop("written_tables", None)
+
+
+class QueryGate:
+    """Caps how many ad-hoc queries run at once, per process and per user."""
+
+    def __init__(self, max_concurrent, max_per_user):
+        self.max_per_user = max_per_user
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._per_user = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def acquire(self, user_id, timeout=QUERY_QUEUE_TIMEOUT):
+        with self._lock:
+            if self._per_user[user_id] >= self.max_per_user:
+                return False
+            self._per_user[user_id] += 1
+        if not self._slots.acquire(timeout=timeout):
+            self._release_user(user_id)
+            return False
+        return True
+
+    def release(self, user_id):
+        self._slots.release()
+        self._release_user(user_id)
+
+    def _release_user(self, user_id):
+        with self._lock:
+            self._per_user[user_id] -= 1
+            if self._per_user[user_id] <= 0:
+                del self._per_user[user_id]
+
+
+query_gate = QueryGate(QUERY_MAX_CONCURRENT, QUERY_MAX_PER_USER)
+export_gate = QueryGate(QUERY_EXPORT_MAX_CONCURRENT, 1)
+
+
+def _set_statement_timeout(dbapi_conn, connection_record, timeout_ms=QUERY_TIMEOUT_MS):
+    """Limits every statement on a Query Maker connection to timeout_ms."""
+    cursor = dbapi_conn.cursor()
+    try:
+        backend = type(dbapi_conn).__module__.split(".")[0].lower()
+        if backend in ("mysqldb", "pymysql", "mysql"):
+            try:
+                cursor.execute(f"SET SESSION max_execution_time = {timeout_ms}")
+            except Exception:
+                # MariaDB names it differently and counts in seconds
+                cursor.execute(f"SET SESSION max_statement_time = {timeout_ms / 1000}")
+        elif backend in ("psycopg2", "psycopg", "pg8000"):
+            cursor.execute(f"SET statement_timeout = {timeout_ms}")
+    finally:
+        cursor.close()
+
+
+def init_querymaker_engine(app):
+    """Applies the statement timeouts to every connection of the querymaker binds.
+
+    Called from create_app(), before prewarm() opens the first connections,
+    so no pooled connection ever runs ad-hoc SQL without the limit.
+    """
+    with app.app_context():
+        event.listen(db.engines["querymaker"], "connect", _set_statement_timeout)
+        event.listen(
+            db.engines["querymaker_export"], "connect",
+            partial(_set_statement_timeout, timeout_ms=QUERY_EXPORT_TIMEOUT_MS)
+        )
+
+
+def get_querymaker_engine(export=False):
+    """Engine of the "querymaker" bind: its own small pool, so ad-hoc queries
+    cannot take connections away from the CRUD pages. Exports get a separate
+    bind whose timeout leaves room for reading the whole result."""
+    return db.engines["querymaker_export" if export else "querymaker"]
+
+
+class QueryProfile:
+    """Timings and plans of one Query Maker run in analyze mode."""
+
+    def __init__(self, sql_query):
+        self.sql_query = sql_query
+        self.ran_at = datetime.now()
+        self.explain_ms = None
+        self.execute_ms = None
+        self.fetch_ms = 0.0
+        self.render_ms = None
+        self.server_ms = None
+        self.rows_examined = None
+        self.rows_returned = 0
+        self.access_types = ""
+        self.plan_json = None
+        self.plan_analyze = None
+
+    def time_render(self, chunks):
+        """Passes the page chunks through, timing how long the server takes to
+        produce them. The rows are read while the template renders, so fetch
+        time is taken out; time spent sending chunks to the client is never
+        counted. render_ms stays None when the page is not rendered to the end."""
+        chunks = iter(chunks)
+        spent = 0.0
+        while True:
+            start = time.perf_counter()
+            try:
+                chunk = next(chunks)
+            except StopIteration:
+                break
+            finally:
+                spent += time.perf_counter() - start
+            yield chunk
+        self.render_ms = max(0.0, spent * 1000 - self.fetch_ms)
+
+
+class QueryHistory:
+    """Last analyzed runs of each user, kept in memory."""
+
+    def __init__(self, size=QUERY_HISTORY_SIZE):
+        self.size = size
+        self._runs = defaultdict(lambda: deque(maxlen=self.size))
+        self._lock = threading.Lock()
+
+    def add(self, user_id, profile):
+        with self._lock:
+            self._runs[user_id].appendleft(profile)
+
+    def for_user(self, user_id):
+        with self._lock:
+            return list(self._runs.get(user_id, ()))
+
+
+query_history = QueryHistory()
+
+
+def access_types(explain_plan):
+    """Summarizes a MySQL EXPLAIN as "table:type" pairs, e.g. "c:ALL, e:ref"."""
+    return ", ".join(
+        f"{row.get('table')}:{row.get('type')}"
+        for row in explain_plan or [] if row.get("type") is not None
+    )
+
+
+def capture_plans(conn, sql_query):
+    """Returns (JSON plan, EXPLAIN ANALYZE output) where the backend has them.
+
+    EXPLAIN ANALYZE runs the query once more to measure it.
+    """
+    backend = conn.dialect.name
+    if backend == "mysql":
+        statements = (f"EXPLAIN FORMAT=JSON {sql_query}", f"EXPLAIN ANALYZE {sql_query}")
+    elif backend == "postgresql":
+        statements = (f"EXPLAIN (FORMAT JSON) {sql_query}", f"EXPLAIN (ANALYZE, BUFFERS) {sql_query}")
+    else:
+        return None, None
+
+    outputs = []
+    for statement in statements:
+        try:
+            rows = conn.execute(text(statement)).fetchall()
+            output = "\n".join(
+                json.dumps(row[0], indent=2) if not isinstance(row[0], str) else row[0]
+                for row in rows
+            )
+        except DBAPIError as e:
+            output = f"Not available: {e.orig}"
+        outputs.append(output)
+    return tuple(outputs)
+
+
+def capture_server_stats(conn, profile):
+    """Server time and rows examined of the last statement run on this connection (MySQL 8)."""
+    if conn.dialect.name != "mysql":
+        return
+    try:
+        row = conn.execute(text("""
+            SELECT TIMER_WAIT / 1000000000 AS server_ms, ROWS_EXAMINED, ROWS_SENT
+            FROM performance_schema.events_statements_history
+            WHERE THREAD_ID = PS_CURRENT_THREAD_ID()
+            ORDER BY EVENT_ID DESC
+            LIMIT 1
+        """)).first()
+    except DBAPIError:
+        return
+    if row is not None:
+        profile.server_ms = float(row.server_ms)
+        profile.rows_examined = row.ROWS_EXAMINED
+
+
+class StreamedResult(QueryResult):
+    """Rows of a Query Maker SELECT read from a server-side cursor.
+
+    Iterating yields plain tuples, at most row_limit of them, so the page can
+    be rendered while rows arrive and memory does not grow with the result.
+    When on_complete is given the rows are also kept (still at most row_limit)
+    and handed to it as a CachedResult once the result is fully known.
+    The connection is owned by the result; close() returns it to the pool and
+    calls on_close.
+    """
+
+    def __init__(self, sql_query, conn, result, row_limit, explain_plan=None, on_complete=None, on_close=None, profile=None):
+        self.sql_query = sql_query
+        self.profile = profile
+        self.keys = list(result.keys())
+        self.row_limit = row_limit
+        self.rows_sent = 0
+        self.truncated = False
+        self.error = None
+        self.explain_plan = explain_plan
+        self._conn = conn
+        self._result = result
+        self._on_complete = on_complete
+        self._on_close = on_close
+        self._rows = [] if on_complete else None
+        self._total = None
+
+    def __iter__(self):
+        finished = False
+        rows = iter(self._result)
+        try:
+            while True:
+                fetch_start = time.perf_counter()
+                row = next(rows, None)
+                if self.profile:
+                    self.profile.fetch_ms += (time.perf_counter() - fetch_start) * 1000
+                if row is None:
+                    break
+                if self.rows_sent >= self.row_limit:
+                    self.truncated = True
+                    break
+                self.rows_sent += 1
+                row = tuple(row)
+                if self._rows is not None:
+                    self._rows.append(row)
+                yield row
+            finished = True
+        except DBAPIError as e:
+            # e.g. the statement timeout fired while rows were being read
+            self.error = str(e.orig)
+        finally:
+            self._result.close()
+        if self.profile and self._conn is not None:
+            self.profile.rows_returned = self.rows_sent
+            capture_server_stats(self._conn, self.profile)
+        if finished and not self.truncated:
+            self._complete(self.rows_sent)
+            self.close()
+
+    def total_count(self):
+        """Total rows of the query; only asks the database when the result was capped."""
+        if not self.truncated:
+            return self.rows_sent
+        if self._total is None:
+            sql = normalize_sql(self.sql_query)
+            try:
+                self._total = self._conn.execute(text(f"SELECT COUNT(*) FROM ({sql}) AS querymaker_count")).scalar()
+            except DBAPIError as e:
+                self.error = str(e.orig)
+                return "?"
+            finally:
+                self.close()
+            self._complete(self._total)
+        return self._total
+
+    def close(self):
+        if self._conn is None:
+            return
+        conn, self._conn = self._conn, None
+        self._result.close()
+        conn.close()
+        if self._on_close:
+            self._on_close()
+
+    def _complete(self, total):
+        if self._on_complete:
+            self._on_complete(CachedResult(self.keys, self._rows, self.truncated, total, self.explain_plan))
+
+
+def execute_query(sql_query, row_limit=QUERY_ROW_LIMIT, user_id=None, analyze=False, export=False):
+    """Runs an ad-hoc SELECT on the Query Maker pool.
+
+    A StreamedResult holds a connection and a concurrency slot until it is
+    closed, so callers must call close() once the rows have been rendered.
+    With analyze, the cache is skipped, plans and timings are captured in
+    result.profile and the run is added to the user's history on close.
+    With export, the query runs on the export pool and gate and its results
+    are neither read from nor kept in the result cache.
+    """
     if not sql_query.strip().lower().startswith('select'):
         return None, "Only SELECT queries are allowed", None
 
+    key = (normalize_sql(sql_query), row_limit)
+    cached = query_cache.get(key) if not export and not analyze else None
+    if cached is not None:
+        return cached, None, cached.explain_plan
+
+    cacheable = not export and not analyze and not _NON_DETERMINISTIC.search(sql_query)
+    profile = QueryProfile(sql_query) if analyze else None
+    snapshot = query_cache.snapshot(tables_in_sql(sql_query))
+
+    gate = export_gate if export else query_gate
+    if not gate.acquire(user_id):
+        return None, "Too many queries running, try again in a moment", None
+
+    conn = None
     try:
-        # Get query plan (no timing info)
-        explain_result = db.session.execute(text(f"EXPLAIN {sql_query}"))
+        conn = get_querymaker_engine(export).connect()
+
+        # Get query plan (plus JSON / ANALYZE plans in analyze mode)
+        explain_start = time.perf_counter()
+        explain_result = conn.execute(text(f"EXPLAIN {sql_query}"))
         explain_plan = [dict(row._mapping) for row in explain_result]
+        if profile:
+            profile.access_types = access_types(explain_plan)
+            profile.plan_json, profile.plan_analyze = capture_plans(conn, sql_query)
+            profile.explain_ms = (time.perf_counter() - explain_start) * 1000
+
+        # Execute the actual query; rows are pulled from the cursor while the page renders
+        execute_start = time.perf_counter()
+        result = conn.execution_options(yield_per=QUERY_FETCH_SIZE).execute(text(sql_query))
+        if profile:
+            profile.execute_ms = (time.perf_counter() - execute_start) * 1000
+
+        on_complete = (lambda finished: query_cache.put(key, snapshot, finished)) if cacheable else None
 
-        # Execute the actual query
-        result = db.session.execute(text(sql_query))
-        rows = result.fetchall()
-        keys = result.keys()
-        data = [dict(zip(keys, row)) for row in rows]
+        def on_close():
+            gate.release(user_id)
+            if profile:
+                query_history.add(user_id, profile)
 
-        return data, None, explain_plan
+        streamed = StreamedResult(
+            sql_query, conn, result, row_limit, explain_plan,
+            on_complete=on_complete,
+            on_close=on_close,
+            profile=profile
+        )
+        return streamed, None, explain_plan
     except Exception as e:
+        if conn is not None:
+            conn.close()
+        gate.release(user_id)
         return None, str(e), None
 
 def get_predefined_queries():
@@ -47,15 +583,10 @@ PREDEFINED_QUERIES = {
 SELECT 
     c.name,
     c.level,
-    COUNT(e.student_id) AS Current_Enrollments,
-    (c.student_limit - COUNT(e.student_id)) AS Available_Spots
+    c.enrolled_count AS Current_Enrollments,
+    (c.student_limit - c.enrolled_count) AS Available_Spots
 FROM course c
-LEFT JOIN enrollment e 
-    ON c.id = e.course_id
-GROUP BY 
-    c.id, c.name, c.level, c.instrument_focus, c.student_limit
-HAVING 
-    COUNT(e.student_id) < c.student_limit
+WHERE c.enrolled_count < c.student_limit
 ORDER BY Available_Spots DESC;
 """,
 
@@ -68,11 +599,10 @@ ORDER BY c.level DESC;
 
     "CONSULTA 03: Alunos que nunca participaram de apresentações": """
 SELECT u.name AS aluno
-FROM user u
-INNER JOIN student s ON u.id = s.user_id
-WHERE s.id NOT IN (
-    SELECT student_id FROM participation
-);
+FROM student_participation_stats sps
+INNER JOIN student s ON s.id = sps.student_id
+INNER JOIN user u ON u.id = s.user_id
+WHERE sps.participation_count = 0;
 """,
 
     "CONSULTA 04: Número médio de alunos por curso": """
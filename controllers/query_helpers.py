@@ -0,0 +1,24 @@
+import base64
+import json
+
+
+def escape_like(value):
+    """Escapes LIKE wildcards so user input only ever matches literally (use with escape="\\")."""
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def encode_cursor(name, row_id):
+    """Opaque keyset cursor for a (name, id) position."""
+    raw = json.dumps([name, row_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_cursor(cursor):
+    """(name, id) of a cursor, or None when it is missing or was tampered with."""
+    if not cursor:
+        return None
+    try:
+        name, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return str(name), int(row_id)
+    except (ValueError, TypeError):
+        return None
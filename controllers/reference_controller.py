@@ -0,0 +1,141 @@
+import os
+import threading
+import time
+from dataclasses import dataclass
+from models import db, Amphitheater, Conductor, Dependency, Professor, Worker, User
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+# An unknown id reloads the snapshot, at most this often (seconds)
+RELOAD_ON_MISS_AFTER = 5
+
+
+@dataclass(frozen=True)
+class DependencyRef:
+    id: int
+    name: str
+
+
+@dataclass(frozen=True)
+class AmphitheaterRef:
+    id: int
+    name: str
+    capacity: int
+
+
+@dataclass(frozen=True)
+class ConductorRef:
+    id: int
+    name: str
+    level: int
+    user_id: int
+
+
+@dataclass(frozen=True)
+class ReferenceData:
+    """One immutable, versioned copy of the reference tables, keyed by id."""
+    version: int
+    dependencies: dict
+    amphitheaters: dict
+    conductors: dict
+    loaded_at: float
+
+    def sorted(self, kind):
+        return sorted(getattr(self, kind).values(), key=lambda ref: (ref.name or "", ref.id))
+
+
+def load_reference_data(version):
+    dependencies = {
+        row.id: DependencyRef(row.id, row.name)
+        for row in db.session.execute(select(Dependency.id, Dependency.name))
+    }
+    amphitheaters = {
+        row.id: AmphitheaterRef(row.id, row.name, row.guest_capacity)
+        for row in db.session.execute(
+            select(Amphitheater.id, Dependency.name, Amphitheater.guest_capacity)
+            .outerjoin(Dependency, Amphitheater.dependency_id == Dependency.id)
+        )
+    }
+    conductors = {
+        row.id: ConductorRef(row.id, row.name, row.level, row.user_id)
+        for row in db.session.execute(
+            select(Conductor.id, Conductor.level, User.name, User.id.label("user_id"))
+            .join(Professor, Conductor.professor_id == Professor.id)
+            .join(Worker, Professor.worker_id == Worker.id)
+            .join(User, Worker.user_id == User.id)
+        )
+    }
+    return ReferenceData(version, dependencies, amphitheaters, conductors, time.monotonic())
+
+
+class ReferenceCache:
+    """Per-process cache of amphitheaters, conductors and dependencies.
+
+    Readers get a whole snapshot, so a page never mixes two versions. Writes
+    through the session bump the version and drop the snapshot; the time to
+    live bounds how long writes made by other processes stay invisible.
+    """
+
+    def __init__(self, ttl=300):
+        self.ttl = ttl
+        self.version = 0
+        self._data = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        data = self._data
+        if data is not None and data.loaded_at + self.ttl > time.monotonic():
+            return data
+        with self._lock:
+            if self._data is None or self._data.loaded_at + self.ttl <= time.monotonic():
+                self._data = load_reference_data(self.version)
+            return self._data
+
+    def warm(self):
+        self.invalidate()
+        return self.get()
+
+    def invalidate(self):
+        with self._lock:
+            self.version += 1
+            self._data = None
+
+    def amphitheater(self, amphitheater_id):
+        return self._lookup("amphitheaters", amphitheater_id)
+
+    def conductor(self, conductor_id):
+        return self._lookup("conductors", conductor_id)
+
+    def _lookup(self, kind, ref_id):
+        data = self.get()
+        ref = getattr(data, kind).get(ref_id)
+        if ref is None and time.monotonic() - data.loaded_at > RELOAD_ON_MISS_AFTER:
+            # May have been created by another process since the snapshot was taken
+            self.invalidate()
+            ref = getattr(self.get(), kind).get(ref_id)
+        return ref
+
+
+reference_cache = ReferenceCache(ttl=float(os.getenv("REFERENCE_CACHE_TTL", 300)))
+
+
+# Conductor names live on the user row, so those users count as reference data too
+REFERENCE_MODELS = (Dependency, Amphitheater, Conductor, Professor, Worker)
+
+@event.listens_for(Session, "after_flush")
+def _track_reference_writes(session, flush_context):
+    data = reference_cache._data
+    conductor_users = {ref.user_id for ref in data.conductors.values()} if data else set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, REFERENCE_MODELS) or (isinstance(obj, User) and obj.id in conductor_users):
+            session.info["reference_cache_stale"] = True
+            return
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_on_commit(session):
+    if session.info.pop("reference_cache_stale", False):
+        reference_cache.invalidate()
+
+@event.listens_for(Session, "after_rollback")
+def _discard_on_rollback(session):
+    session.info.pop("reference_cache_stale", None)
@@ -1,9 +1,79 @@
-from main import db
-from models import User
+import os
+from concurrent.futures import ProcessPoolExecutor
+from models import db, User
+from controllers.auth_controller import principal_cache
+from controllers.query_helpers import escape_like, encode_cursor, decode_cursor
+from sqlalchemy import and_, or_, insert, select
+from werkzeug.security import generate_password_hash
+
+USERS_PAGE_SIZE = 50
+USERS_MAX_PAGE_SIZE = 200
+
+BULK_INSERT_BATCH_SIZE = 5000
+# Below this many passwords the process pool start-up costs more than it saves
+PARALLEL_HASH_MIN = 64
+
 
 def get_all_users():
     return User.query.all()
 
+
+def users_export_query(name_prefix=None):
+    """Every user (without the password hash) in list order, for the export."""
+    query = select(User.id, User.name, User.email).order_by(User.name.asc(), User.id.asc())
+    if name_prefix:
+        query = query.where(User.name.like(escape_like(name_prefix) + "%", escape="\\"))
+    return query
+
+
+def get_users_page(after=None, before=None, name_prefix=None, per_page=USERS_PAGE_SIZE):
+    """Keyset pagination over (name, id).
+
+    The `user.name` index already carries the primary key, so ordering by
+    (name, id) and seeking past the cursor is served by the index and costs
+    the same on the first page as on the last.
+    Returns (users, next_cursor, prev_cursor).
+    """
+    per_page = max(1, min(int(per_page), USERS_MAX_PAGE_SIZE))
+    query = User.query
+
+    if name_prefix:
+        query = query.filter(User.name.like(escape_like(name_prefix) + "%", escape="\\"))
+
+    after = decode_cursor(after)
+    before = decode_cursor(before) if not after else None
+
+    if after:
+        name, user_id = after
+        query = query.filter(or_(User.name > name, and_(User.name == name, User.id > user_id)))
+        query = query.order_by(User.name.asc(), User.id.asc())
+    elif before:
+        name, user_id = before
+        query = query.filter(or_(User.name < name, and_(User.name == name, User.id < user_id)))
+        query = query.order_by(User.name.desc(), User.id.desc())
+    else:
+        query = query.order_by(User.name.asc(), User.id.asc())
+
+    # Fetch one extra row to know whether there is another page in that direction
+    users = query.limit(per_page + 1).all()
+    has_more = len(users) > per_page
+    users = users[:per_page]
+
+    if before:
+        users.reverse()
+
+    next_cursor = None
+    prev_cursor = None
+    if users:
+        first, last = users[0], users[-1]
+        if has_more or before:
+            next_cursor = encode_cursor(last.name, last.id)
+        if (has_more and before) or after:
+            prev_cursor = encode_cursor(first.name, first.id)
+
+    return users, next_cursor, prev_cursor
+
+
 def create_user(name, email, password):
     if User.query.filter_by(email=email).first():
         return None, "Email already exists"
@@ -13,6 +83,69 @@ def create_user(name, email, password):
     db.session.commit()
     return user, None
 
+def iter_password_hashes(passwords, reuse_identical=False, processes=None):
+    """Yields one hash per password, in order.
+
+    Hashing is spread over a process pool (one process per core by default).
+    pool.map submits everything up front, so the workers keep hashing while
+    the caller consumes and inserts earlier results.
+    With reuse_identical, equal passwords share a single hash (and salt);
+    only meant for seed and test data.
+    """
+    if reuse_identical:
+        cache = {}
+        for password in passwords:
+            if password not in cache:
+                cache[password] = generate_password_hash(password)
+            yield cache[password]
+        return
+
+    if len(passwords) < PARALLEL_HASH_MIN:
+        for password in passwords:
+            yield generate_password_hash(password)
+        return
+
+    workers = processes or os.cpu_count() or 1
+    chunksize = max(1, len(passwords) // (workers * 8))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        yield from pool.map(generate_password_hash, passwords, chunksize=chunksize)
+
+
+def create_users_bulk(users, reuse_identical_passwords=False, processes=None, batch_size=BULK_INSERT_BATCH_SIZE):
+    """Creates many users at once from dicts with name, email and password.
+
+    Passwords are hashed in parallel and rows are written with multi-row
+    INSERTs, one per batch. Returns (number of users created, error).
+    """
+    users = list(users)
+    emails = [u["email"] for u in users]
+    if len(set(emails)) != len(emails):
+        return None, "Duplicate emails in input"
+
+    for i in range(0, len(emails), batch_size):
+        existing = db.session.query(User.email).filter(User.email.in_(emails[i:i + batch_size])).first()
+        if existing:
+            return None, f"Email already exists: {existing.email}"
+
+    hashes = iter_password_hashes(
+        [u["password"] for u in users],
+        reuse_identical=reuse_identical_passwords,
+        processes=processes
+    )
+
+    batch = []
+    for user, password_hash in zip(users, hashes):
+        batch.append({"name": user["name"], "email": user["email"], "password": password_hash})
+        if len(batch) == batch_size:
+            db.session.execute(insert(User.__table__), batch)
+            batch = []
+    if batch:
+        db.session.execute(insert(User.__table__), batch)
+
+    db.session.commit()
+    return len(users), None
+
+
 def get_user(user_id):
     return User.query.get(user_id)
 
@@ -22,7 +155,10 @@ def update_user(user, name, email, password=None):
     if password:
         user.password = password
     db.session.commit()
+    principal_cache.invalidate(user.id)
 
 def delete_user(user):
+    user_id = user.id
     db.session.delete(user)
     db.session.commit()
+    principal_cache.invalidate(user_id)
@@ -1,6 +1,57 @@
-from main import db
-from sqlalchemy import text
+from models import db, Class, Course, Classroom, Dependency, Professor, Worker, User
+from sqlalchemy import text, select
 
 def get_all_classes_schedule():
     result = db.session.execute(text("SELECT * FROM vw_agenda_aulas"))
-    return [dict(row._mapping) for row in result]
\ No newline at end of file
+    return [dict(row._mapping) for row in result]
+
+
+def classes_schedule_query(date_from, date_to, classroom_id=None, professor_id=None):
+    """Same rows as vw_agenda_aulas, limited to classes in [date_from, date_to).
+
+    The window is applied on class.date first (indexed, or through
+    (classroom_id, date) when filtering by classroom), so only the classes in
+    the window are joined to resolve course, room and professor names.
+    """
+    query = (
+        select(
+            Class.date.label("data_hora"),
+            Course.name.label("curso"),
+            Dependency.name.label("sala"),
+            User.name.label("professor")
+        )
+        .join(Course, Class.course_id == Course.id)
+        .join(Classroom, Class.classroom_id == Classroom.id)
+        .join(Dependency, Classroom.dependency_id == Dependency.id)
+        .join(Professor, Course.professor_id == Professor.id)
+        .join(Worker, Professor.worker_id == Worker.id)
+        .join(User, Worker.user_id == User.id)
+        .where(Class.date >= date_from, Class.date < date_to)
+        .order_by(Class.date.asc())
+    )
+    if classroom_id:
+        query = query.where(Class.classroom_id == classroom_id)
+    if professor_id:
+        query = query.where(Course.professor_id == professor_id)
+    return query
+
+
+def get_classes_schedule(date_from, date_to, classroom_id=None, professor_id=None):
+    query = classes_schedule_query(date_from, date_to, classroom_id, professor_id)
+    return [dict(row._mapping) for row in db.session.execute(query)]
+
+
+def get_schedule_filters():
+    """Classrooms and professors for the agenda filter dropdowns, as (id, name) rows."""
+    classrooms = db.session.execute(
+        select(Classroom.id, Dependency.name)
+        .join(Dependency, Classroom.dependency_id == Dependency.id)
+        .order_by(Dependency.name)
+    ).all()
+    professors = db.session.execute(
+        select(Professor.id, User.name)
+        .join(Worker, Professor.worker_id == Worker.id)
+        .join(User, Worker.user_id == User.id)
+        .order_by(User.name)
+    ).all()
+    return classrooms, professors
@@ -0,0 +1,224 @@
+import argparse
+import os
+import re
+import threading
+import time
+from sqlalchemy import event, text
+from sqlalchemy.engine import Engine
+from models import db
+
+# Access types that read the whole table or the whole index
+FULL_SCAN_TYPES = ("ALL", "index")
+# Longest index the advisor proposes; up to this it also adds the selected columns to make it covering
+MAX_INDEX_COLUMNS = 4
+# Seconds the index list of a table is trusted; catches DDL run outside this process
+EXISTING_INDEXES_TTL = float(os.getenv("INDEX_ADVISOR_CACHE_TTL", 300))
+
+_SQL_KEYWORDS = {
+    "on", "where", "join", "left", "right", "inner", "outer", "cross", "natural",
+    "group", "order", "limit", "having", "union", "using", "straight_join",
+}
+_TABLE_REF = re.compile(r"\b(?:from|join)\s+`?(\w+)`?(?:\s+(?:as\s+)?`?(\w+)`?)?", re.IGNORECASE)
+
+_existing_indexes = {}
+_existing_lock = threading.RLock()
+_DDL = re.compile(r"^\s*(create|drop|alter|rename|truncate)\b", re.IGNORECASE)
+
+
+def table_aliases(sql_query):
+    """Maps every alias (and table name) in FROM / JOIN clauses to its table."""
+    aliases = {}
+    for table, alias in _TABLE_REF.findall(sql_query):
+        table = table.lower()
+        if table not in db.metadata.tables:
+            continue
+        aliases[table] = table
+        if alias and alias.lower() not in _SQL_KEYWORDS:
+            aliases[alias.lower()] = table
+    return aliases
+
+
+def existing_indexes(table):
+    """Column lists of the primary key and every index of the table.
+
+    Cached for EXISTING_INDEXES_TTL seconds, and dropped as soon as this
+    process runs any DDL.
+    """
+    with _existing_lock:
+        cached = _existing_indexes.get(table)
+        if cached is not None and time.monotonic() - cached[0] < EXISTING_INDEXES_TTL:
+            return cached[1]
+        inspector = db.inspect(db.engine)
+        indexes = [inspector.get_pk_constraint(table)["constrained_columns"]]
+        indexes += [index["column_names"] for index in inspector.get_indexes(table)]
+        indexes = [[c.lower() for c in cols] for cols in indexes if cols]
+        _existing_indexes[table] = (time.monotonic(), indexes)
+        return indexes
+
+
+def forget_existing_indexes():
+    with _existing_lock:
+        _existing_indexes.clear()
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _forget_on_ddl(conn, cursor, statement, parameters, context, executemany):
+    if _DDL.match(statement):
+        forget_existing_indexes()
+
+
+def _column_roles(sql_query, alias, table, single_table):
+    """Splits the table's columns used by the query into equality, range, ordering and other uses."""
+    sql = sql_query.lower()
+    columns = [c.name.lower() for c in db.metadata.tables[table].columns]
+    prefix = rf"(?:\b{re.escape(alias)}\.)" + ("?" if single_table else "")
+
+    tail = re.search(r"\b(?:group|order)\s+by\b(.*)$", sql, re.DOTALL)
+    tail = tail.group(1) if tail else ""
+
+    roles = {"equality": [], "range": [], "ordering": [], "other": []}
+    for column in columns:
+        ref = rf"{prefix}\b{re.escape(column)}\b"
+        if not re.search(ref, sql):
+            continue
+        if re.search(rf"{ref}\s*(?:=|\bin\b)|=\s*{ref}", sql):
+            roles["equality"].append(column)
+        elif re.search(rf"{ref}\s*(?:<>|!=|<=|>=|<|>|\bbetween\b|\blike\b)", sql):
+            roles["range"].append(column)
+        elif re.search(ref, tail):
+            roles["ordering"].append(column)
+        else:
+            roles["other"].append(column)
+    return roles
+
+
+def suggest_index(sql_query, alias, table, single_table):
+    """Column list for an index that would avoid the full scan, or None."""
+    roles = _column_roles(sql_query, alias, table, single_table)
+    primary_key = existing_indexes(table)[0]
+    if len(primary_key) == 1:
+        # Lookups by a single-column primary key are already served by it
+        for role in roles.values():
+            if primary_key[0] in role:
+                role.remove(primary_key[0])
+
+    columns = roles["equality"] + roles["range"][:1] + roles["ordering"]
+    if not columns:
+        return None
+    if len(columns) + len(roles["other"]) <= MAX_INDEX_COLUMNS:
+        columns += roles["other"]
+    columns = list(dict.fromkeys(columns))[:MAX_INDEX_COLUMNS]
+
+    for existing in existing_indexes(table):
+        if existing[:len(columns)] == columns:
+            return None
+    return columns
+
+
+def index_name(table, columns):
+    return f"ix_{table}_{'_'.join(columns)}"[:64]
+
+
+def advise(sql_query, explain_plan):
+    """Findings for one query from its (MySQL) EXPLAIN rows.
+
+    Each finding is a dict with the table, the problems seen (full scan,
+    filesort, temporary table), the estimated rows and, when one helps, the
+    proposed index columns and its CREATE INDEX statement.
+    """
+    if not explain_plan or db.engine.dialect.name != "mysql":
+        return []
+
+    aliases = table_aliases(sql_query)
+    single_table = len(set(aliases.values())) == 1
+    findings = []
+    for row in explain_plan:
+        alias = (row.get("table") or "").lower()
+        table = aliases.get(alias)
+        extra = row.get("Extra") or ""
+
+        problems = []
+        if row.get("type") in FULL_SCAN_TYPES:
+            problems.append("full table scan" if row.get("type") == "ALL" else "full index scan")
+        if "Using filesort" in extra:
+            problems.append("filesort")
+        if "Using temporary" in extra:
+            problems.append("temporary table")
+        if not problems or table is None:
+            continue
+
+        columns = suggest_index(sql_query, alias, table, single_table)
+        finding = {
+            "table": table,
+            "alias": alias,
+            "problems": problems,
+            "rows": row.get("rows"),
+            "columns": columns,
+            "ddl": None,
+        }
+        if columns:
+            finding["ddl"] = f"CREATE INDEX {index_name(table, columns)} ON {table} ({', '.join(columns)})"
+        findings.append(finding)
+    return findings
+
+
+def explain(conn, sql_query):
+    return [dict(row._mapping) for row in conn.execute(text(f"EXPLAIN {sql_query}"))]
+
+
+def run_advisor(queries, apply=False, runs=10):
+    """Advises on every (title, sql) pair; with apply, creates the proposed
+    indexes and measures the affected queries before and after."""
+    from indexes_benchmark import candidate_index, measure_query
+
+    with db.engine.connect() as conn:
+        findings = {title: advise(sql, explain(conn, sql)) for title, sql in queries}
+
+    proposals = {}
+    for title, query_findings in findings.items():
+        for finding in query_findings:
+            print(f"{title}: {finding['table']} ({finding['alias']}) - {', '.join(finding['problems'])}, ~{finding['rows']} rows")
+            if finding["ddl"]:
+                print(f"    {finding['ddl']}")
+                key = (finding["table"], tuple(finding["columns"]))
+                proposals.setdefault(key, set()).add(title)
+
+    if not proposals:
+        print("No index to propose.")
+        return findings
+    if not apply:
+        print(f"\n{len(proposals)} index(es) proposed. Dry run, nothing changed (use --apply).")
+        return findings
+
+    affected = [(title, sql) for title, sql in queries if any(title in titles for titles in proposals.values())]
+    with db.engine.connect() as conn:
+        before = {title: measure_query(conn, sql, runs) for title, sql in affected}
+
+    with db.engine.begin() as conn:
+        for table, columns in proposals:
+            candidate_index(index_name(table, list(columns)), table, list(columns)).create(bind=conn)
+            conn.execute(text(f"ANALYZE TABLE `{table}`"))
+    forget_existing_indexes()
+
+    with db.engine.connect() as conn:
+        after = {title: measure_query(conn, sql, runs) for title, sql in affected}
+
+    print(f"\n{'p50 before':>12}{'p50 after':>12}  query")
+    for title, _ in affected:
+        print(f"{before[title]['p50_ms']:>10.2f}ms{after[title]['p50_ms']:>10.2f}ms  {title}  [{before[title]['access']} -> {after[title]['access']}]")
+    return findings
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Propose indexes from the EXPLAIN plans of the predefined queries.")
+    parser.add_argument("--sql", action="append", default=[], help="also analyze this query (repeatable)")
+    parser.add_argument("--apply", action="store_true", help="create the proposed indexes and re-measure")
+    parser.add_argument("--runs", type=int, default=10, help="timed runs per query when applying")
+    args = parser.parse_args()
+
+    from main import create_app
+
+    with create_app(web=False).app_context():
+        from controllers.queries_controller import PREDEFINED_QUERIES
+        queries = list(PREDEFINED_QUERIES.items()) + [(f"--sql {i + 1}", sql) for i, sql in enumerate(args.sql)]
+        run_advisor(queries, apply=args.apply, runs=args.runs)
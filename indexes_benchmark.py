@@ -0,0 +1,163 @@
+import argparse
+import json
+import math
+import time
+from datetime import datetime
+from sqlalchemy import Index, MetaData, text
+from main import create_app
+from models import db
+from seeder import reset_and_seed
+from controllers.queries_controller import PREDEFINED_QUERIES, access_types
+
+# Secondary indexes declared in models.py whose effect is measured (FK indexes stay)
+CURRENT_INDEXES = [
+    ("user", "ix_user_name"),
+    ("course", "ix_course_level"),
+]
+
+# Indexes not in the schema yet, measured to decide whether they are worth adding
+CANDIDATE_INDEXES = [
+    ("ix_course_instrument_focus", "course", ["instrument_focus"]),
+    ("ix_presentation_level", "presentation", ["level"]),
+    ("ix_presentation_date", "presentation", ["date"]),
+    ("ix_instrument_status", "instrument", ["status"]),
+    ("ix_enrollment_course_student", "enrollment", ["course_id", "student_id"]),
+]
+
+VARIANTS = ("none", "current", "candidates")
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not samples:
+        return None
+    rank = max(1, math.ceil(pct / 100 * len(samples)))
+    return samples[min(rank, len(samples)) - 1]
+
+
+def model_index(table_name, index_name):
+    return next(i for i in db.metadata.tables[table_name].indexes if i.name == index_name)
+
+
+# Candidate indexes are built on a copy of the tables, so db.create_all() never creates them
+_candidate_metadata = MetaData()
+_candidate_indexes = {}
+
+def candidate_index(name, table_name, columns):
+    if name not in _candidate_indexes:
+        table = _candidate_metadata.tables.get(table_name)
+        if table is None:
+            table = db.metadata.tables[table_name].to_metadata(_candidate_metadata)
+        _candidate_indexes[name] = Index(name, *(table.c[column] for column in columns))
+    return _candidate_indexes[name]
+
+
+def apply_variant(variant):
+    """Drops or creates indexes so the schema matches the variant."""
+    current = [model_index(table, name) for table, name in CURRENT_INDEXES]
+    candidates = [candidate_index(*spec) for spec in CANDIDATE_INDEXES]
+
+    wanted_current = variant in ("current", "candidates")
+    wanted_candidates = variant == "candidates"
+
+    with db.engine.begin() as conn:
+        existing = {
+            (table, index["name"])
+            for table in {i.table.name for i in current + candidates}
+            for index in db.inspect(conn).get_indexes(table)
+        }
+        for index in current:
+            present = (index.table.name, index.name) in existing
+            if wanted_current and not present:
+                index.create(bind=conn)
+            elif not wanted_current and present:
+                index.drop(bind=conn)
+        for index in candidates:
+            present = (index.table.name, index.name) in existing
+            if wanted_candidates and not present:
+                index.create(bind=conn)
+            elif not wanted_candidates and present:
+                index.drop(bind=conn)
+        if conn.dialect.name == "mysql":
+            for table in db.metadata.tables:
+                conn.execute(text(f"ANALYZE TABLE `{table}`"))
+
+
+def measure_query(conn, sql, runs):
+    explain_plan = []
+    try:
+        explain_plan = [dict(row._mapping) for row in conn.execute(text(f"EXPLAIN {sql}"))]
+    except Exception:
+        pass
+
+    # One warm-up run so the first sample does not pay for cold caches
+    row_count = len(conn.execute(text(sql)).fetchall())
+
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        conn.execute(text(sql)).fetchall()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+
+    return {
+        "rows": row_count,
+        "p50_ms": percentile(samples, 50),
+        "p95_ms": percentile(samples, 95),
+        "p99_ms": percentile(samples, 99),
+        "mean_ms": sum(samples) / len(samples),
+        "access": access_types(explain_plan),
+    }
+
+
+def table_sizes(conn):
+    return {
+        table: conn.execute(text(f"SELECT COUNT(*) FROM `{table}`")).scalar()
+        for table in db.metadata.tables
+    }
+
+
+def run_benchmark(scales, runs, variants=VARIANTS):
+    report = {
+        "generated_at": datetime.now().isoformat(timespec="seconds"),
+        "backend": db.engine.dialect.name,
+        "runs": runs,
+        "scales": [],
+    }
+
+    for scale in scales:
+        print(f"Seeding scale {scale}...")
+        reset_and_seed(bulk=True, scale=scale)
+        with db.engine.connect() as conn:
+            scale_report = {"scale": scale, "table_rows": table_sizes(conn), "results": []}
+
+        for variant in variants:
+            print(f"  indexes: {variant}")
+            apply_variant(variant)
+            with db.engine.connect() as conn:
+                for title, sql in PREDEFINED_QUERIES.items():
+                    result = measure_query(conn, sql, runs)
+                    result.update({"query": title, "variant": variant})
+                    scale_report["results"].append(result)
+                    print(f"    {result['p50_ms']:8.2f} {result['p95_ms']:8.2f} {result['p99_ms']:8.2f} ms  {title}  [{result['access']}]")
+
+        report["scales"].append(scale_report)
+
+    apply_variant("current")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the predefined queries with and without indexes.")
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10, 100], help="seeder scale factors to test")
+    parser.add_argument("--runs", type=int, default=20, help="timed runs per query")
+    parser.add_argument("--variants", nargs="+", choices=VARIANTS, default=list(VARIANTS), help="index sets to compare")
+    parser.add_argument("--output", default="index_benchmark.json", help="where to write the JSON report")
+    args = parser.parse_args()
+
+    with create_app(web=False).app_context():
+        report = run_benchmark(args.scales, args.runs, args.variants)
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"Report written to {args.output}")
@@ -1,7 +1,8 @@
 import random
 from datetime import datetime, timedelta, time
 from faker import Faker
-from main import app, db 
+from main import create_app
+from models import db
 from models import User, Admin, Worker, Student, Maintenancer, Professor, Secretary, Conductor, \
     Dependency, Amphitheater, Classroom, Course, Class, Enrollment, Attendance, Participation, \
     Instrument, Maintenance, Presentation, Rehearsal
@@ -10,6 +11,7 @@ from sqlalchemy import text
 from views import create_views
 from seeder import *
 from tqdm import tqdm
+from controllers.users_controller import create_users_bulk
 
 
 def seed_courses_simple(quantity):
@@ -33,19 +35,22 @@ def seed_courses_simple(quantity):
 
 
 def seed_users_simple(quantity):
-    for i in tqdm(range(quantity), desc="Seeding Users"):
-        user = User(
-            name=f"Test User {i+1}",
-            email=f"testuser{i+1}@example.com",
-            password="123456"
-        )
-        db.session.add(user)
-    
-    db.session.commit()
+    users = [
+        {
+            "name": f"Test User {i+1}",
+            "email": f"testuser{i+1}@example.com",
+            "password": "123456"
+        }
+        for i in tqdm(range(quantity), desc="Seeding Users")
+    ]
+    # Every test user has the same password, so a single hash is enough
+    count, error = create_users_bulk(users, reuse_identical_passwords=True)
+    if error:
+        raise ValueError(error)
 
 
 if __name__ == "__main__":
-    with app.app_context():
+    with create_app(web=False).app_context():
         reset_and_seed()
         print("Starting user overload...")
         seed_users_simple(10_000)
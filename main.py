@@ -1,42 +1,154 @@
+import time
+
+IMPORT_STARTED = time.perf_counter()
+
+import logging
 import os
 from flask import Flask
 from dotenv import load_dotenv
 from models import db
+from pool_stats import InstrumentedQueuePool
 
 load_dotenv()
 
-app = Flask(__name__)
-app.secret_key = os.getenv("SECRET_KEY")
+logger = logging.getLogger(__name__)
+
+
+def default_config():
+    """Configuration read from the environment (.env)."""
+    engine_options = {
+        'poolclass': InstrumentedQueuePool,
+        'pool_size': int(os.getenv("DB_POOL_SIZE", 10)),
+        'max_overflow': int(os.getenv("DB_MAX_OVERFLOW", 10)),
+        'pool_timeout': float(os.getenv("DB_POOL_TIMEOUT", 30)),
+        'pool_recycle': int(os.getenv("DB_POOL_RECYCLE", 1800)),
+        'pool_pre_ping': os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes"),
+    }
+    return {
+        'SECRET_KEY': os.getenv("SECRET_KEY"),
+        'SQLALCHEMY_DATABASE_URI': os.getenv("DATABASE_URL"),
+        'SQLALCHEMY_TRACK_MODIFICATIONS': False,
+        'SQLALCHEMY_ENGINE_OPTIONS': engine_options,
+        # Separate pool for Query Maker traffic, so slow ad-hoc queries don't starve the CRUD pages
+        'SQLALCHEMY_BINDS': {
+            'querymaker': {
+                'url': os.getenv("QUERYMAKER_DATABASE_URL") or os.getenv("DATABASE_URL"),
+                'poolclass': InstrumentedQueuePool,
+                'pool_size': int(os.getenv("QUERYMAKER_MAX_CONCURRENT", 4)),
+                'max_overflow': 0,
+                'pool_timeout': 5,
+                'pool_recycle': engine_options['pool_recycle'],
+                'pool_pre_ping': True,
+            },
+            # Query Maker exports: longer statement timeout, so they get their own few connections
+            'querymaker_export': {
+                'url': os.getenv("QUERYMAKER_DATABASE_URL") or os.getenv("DATABASE_URL"),
+                'poolclass': InstrumentedQueuePool,
+                'pool_size': int(os.getenv("QUERYMAKER_EXPORT_MAX_CONCURRENT", 2)),
+                'max_overflow': 0,
+                'pool_timeout': 5,
+                'pool_recycle': engine_options['pool_recycle'],
+                'pool_pre_ping': True,
+            }
+        },
+        # Connections opened per engine before the first request
+        'POOL_PREWARM': int(os.getenv("DB_POOL_PREWARM", 2)),
+        'PREWARM': True,
+        # Startup phases over these budgets (milliseconds) are logged as warnings
+        'STARTUP_BUDGET_MS': float(os.getenv("STARTUP_BUDGET_MS", 2000)),
+        'FIRST_REQUEST_BUDGET_MS': float(os.getenv("FIRST_REQUEST_BUDGET_MS", 500)),
+    }
+
+
+def register_blueprints(app):
+    # Imported here so scripts that only need the database never load the web stack
+    from routes.main_routes import main_bp
+    from routes.users_routes import users_bp
+    from routes.presentation_routes import presentations_bp
+    from routes.queries_routes import queries_bp
+    from routes.views_routes import views_bp
+    from routes.admin_routes import admin_bp, metrics_bp
+
+    for blueprint in (main_bp, users_bp, presentations_bp, queries_bp, views_bp, admin_bp, metrics_bp):
+        app.register_blueprint(blueprint)
+
+
+def init_extensions(app):
+    from controllers.auth_controller import login_manager
+    from sql_tracker import init_sql_tracking
+    from metrics import init_metrics
+    from profiler import init_profiler
+    from controllers.queries_controller import init_querymaker_engine
+
+    login_manager.init_app(app)
+    init_querymaker_engine(app)
+    init_profiler(app)
+    init_sql_tracking(app)
+    init_metrics(app)
+
+
+def prewarm(app):
+    """Compiles the templates, fills the connection pools, loads the reference
+    cache and serves one request, so the first real user doesn't pay for it.
+    Returns how long the warm-up request took, in milliseconds."""
+    from controllers.reference_controller import reference_cache
+
+    for name in app.jinja_env.list_templates():
+        app.jinja_env.get_template(name)
+
+    with app.app_context():
+        for engine in db.engines.values():
+            connections = [engine.connect() for _ in range(min(app.config['POOL_PREWARM'], engine.pool.size()))]
+            for connection in connections:
+                connection.close()
+        reference_cache.warm()
+
+    started = time.perf_counter()
+    app.test_client().get("/login")
+    return (time.perf_counter() - started) * 1000
+
+
+def create_app(config=None, web=True):
+    """Builds the Flask app.
+
+    `config` overrides the values from the environment. Scripts that only
+    talk to the database pass web=False and get the app without blueprints,
+    login or instrumentation.
+    """
+    started = time.perf_counter()
+    app = Flask(__name__)
+    app.config.from_mapping(default_config())
+    if config:
+        app.config.from_mapping(config)
+    db.init_app(app)
+
+    if not web:
+        return app
 
-app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv("DATABASE_URL")
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-db.init_app(app)
+    init_extensions(app)
+    register_blueprints(app)
+    timings = {
+        "import_ms": IMPORT_MS,
+        "create_app_ms": (time.perf_counter() - started) * 1000,
+    }
 
+    if app.config['PREWARM']:
+        prewarm_started = time.perf_counter()
+        timings["first_request_ms"] = prewarm(app)
+        timings["prewarm_ms"] = (time.perf_counter() - prewarm_started) * 1000
 
+    app.config['STARTUP_TIMINGS'] = timings
+    startup_ms = sum(ms for phase, ms in timings.items() if phase != "first_request_ms")
+    if startup_ms > app.config['STARTUP_BUDGET_MS']:
+        logger.warning("Startup took %.0f ms, budget is %.0f ms (%s)", startup_ms, app.config['STARTUP_BUDGET_MS'], timings)
+    if timings.get("first_request_ms", 0) > app.config['FIRST_REQUEST_BUDGET_MS']:
+        logger.warning("First request took %.0f ms, budget is %.0f ms", timings["first_request_ms"], app.config['FIRST_REQUEST_BUDGET_MS'])
+    return app
 
-from routes.main_routes import *
-from routes.users_routes import users_bp
-from routes.presentation_routes import presentations_bp
-from routes.queries_routes import queries_bp
-from routes.views_routes import views_bp
 
-if 'users' not in app.blueprints:
-    app.register_blueprint(users_bp)
-    
-if 'presentations' not in app.blueprints:
-    app.register_blueprint(presentations_bp)
-    
-if 'queries' not in app.blueprints:
-    app.register_blueprint(queries_bp)
-    
-if 'views' not in app.blueprints:
-    app.register_blueprint(views_bp)
-    
-from controllers.auth_controller import login_manager
+# Time to import this module and what it needs before create_app() runs
+IMPORT_MS = (time.perf_counter() - IMPORT_STARTED) * 1000
 
-login_manager.init_app(app)
-login_manager.login_view = 'login_get'   
-    
 
 if __name__ == "__main__":
-    app.run(debug=True)
+    create_app().run(debug=True)
@@ -0,0 +1,151 @@
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from flask import g, request
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Lets a scraper read /metrics without a session (Authorization: Bearer <token>)
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+
+
+class RequestMetrics:
+    """Per-endpoint request counters, latency histograms and DB time.
+
+    Every update is a few dict operations under one lock, so recording a
+    request costs microseconds; the text exposition is built only when
+    /metrics is scraped.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.in_flight = 0
+        self.requests = defaultdict(int)
+        self.latency = {}
+        self.db_seconds = defaultdict(float)
+        self.db_statements = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            self.in_flight += 1
+
+    def finish(self, endpoint, method, status, duration, db_seconds, db_statements):
+        with self._lock:
+            self.in_flight -= 1
+            self.requests[(endpoint, method, status)] += 1
+            histogram = self.latency.get((endpoint, method))
+            if histogram is None:
+                histogram = self.latency[(endpoint, method)] = Histogram(self.buckets)
+            histogram.observe(duration)
+            self.db_seconds[endpoint] += db_seconds
+            self.db_statements[endpoint] += db_statements
+
+    def render(self, startup_timings=None):
+        """Prometheus text exposition format (version 0.0.4)."""
+        with self._lock:
+            in_flight = self.in_flight
+            requests = dict(self.requests)
+            latency = {key: (list(h.counts), h.total) for key, h in self.latency.items()}
+            db_seconds = dict(self.db_seconds)
+            db_statements = dict(self.db_statements)
+
+        lines = [
+            "# HELP http_requests_in_flight Requests being served right now.",
+            "# TYPE http_requests_in_flight gauge",
+            f"http_requests_in_flight {in_flight}",
+            "# HELP http_requests_total Finished requests by endpoint, method and status code.",
+            "# TYPE http_requests_total counter",
+        ]
+        for (endpoint, method, status), count in sorted(requests.items()):
+            lines.append(f"http_requests_total{_labels(endpoint=endpoint, method=method, status=status)} {count}")
+
+        lines += [
+            "# HELP http_request_duration_seconds Request latency by endpoint and method.",
+            "# TYPE http_request_duration_seconds histogram",
+        ]
+        for (endpoint, method), (counts, total) in sorted(latency.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                lines.append(f"http_request_duration_seconds_bucket{_labels(endpoint=endpoint, method=method, le=bound)} {cumulative}")
+            lines.append(f"http_request_duration_seconds_sum{_labels(endpoint=endpoint, method=method)} {total}")
+            lines.append(f"http_request_duration_seconds_count{_labels(endpoint=endpoint, method=method)} {cumulative}")
+
+        lines += [
+            "# HELP http_request_db_seconds_total Time spent in SQL statements by endpoint.",
+            "# TYPE http_request_db_seconds_total counter",
+        ]
+        for endpoint, seconds in sorted(db_seconds.items()):
+            lines.append(f"http_request_db_seconds_total{_labels(endpoint=endpoint)} {seconds}")
+        lines += [
+            "# HELP http_request_db_statements_total SQL statements run by endpoint.",
+            "# TYPE http_request_db_statements_total counter",
+        ]
+        for endpoint, count in sorted(db_statements.items()):
+            lines.append(f"http_request_db_statements_total{_labels(endpoint=endpoint)} {count}")
+
+        if startup_timings:
+            lines += [
+                "# HELP app_startup_seconds Time spent in each startup phase.",
+                "# TYPE app_startup_seconds gauge",
+            ]
+            for phase, ms in sorted(startup_timings.items()):
+                lines.append(f"app_startup_seconds{_labels(phase=phase.removesuffix('_ms'))} {ms / 1000}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(**labels):
+    pairs = []
+    for name, value in labels.items():
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{name}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+request_metrics = RequestMetrics()
+
+
+def _start_request():
+    g.metrics_start = time.perf_counter()
+    request_metrics.start()
+
+
+def _record_status(response):
+    g.metrics_status = response.status_code
+    return response
+
+
+def _finish_request(exc):
+    start = g.pop("metrics_start", None)
+    if start is None:
+        return
+    queries = g.get("sql_queries")
+    request_metrics.finish(
+        # Unmatched URLs share one label, so 404 scans can't blow up the series count
+        endpoint=request.endpoint or "unmatched",
+        method=request.method,
+        status=g.pop("metrics_status", 500),
+        duration=time.perf_counter() - start,
+        db_seconds=queries.total_time if queries else 0.0,
+        db_statements=queries.count if queries else 0,
+    )
+
+
+def init_metrics(app):
+    app.before_request(_start_request)
+    app.after_request(_record_status)
+    app.teardown_request(_finish_request)
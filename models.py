@@ -66,6 +66,14 @@ class Student(db.Model):
         back_populates='students'
     )
 
+class StudentParticipationStats(db.Model):
+    """Per-student participation summary, maintained by the participation triggers in triggers.py."""
+    __tablename__ = 'student_participation_stats'
+    student_id = db.Column(db.Integer, ForeignKey('student.id', ondelete='CASCADE', onupdate='CASCADE'), primary_key=True)
+    participation_count = db.Column(db.Integer, nullable=False, default=0, server_default='0', index=True)
+    last_participation_date = db.Column(db.DateTime)
+
+
 class Maintenancer(db.Model):
     __tablename__ = 'maintenancer'
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
@@ -135,19 +143,26 @@ class Course(db.Model):
     level = db.Column(db.SmallInteger, nullable=False, index=True)
     instrument_focus = db.Column(db.String(100), nullable=False)
     student_limit = db.Column(db.Integer, nullable=False)
+    # Maintained by the enrollment triggers in triggers.py
+    enrolled_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     professor_id = db.Column(db.Integer, ForeignKey('professor.id', ondelete='SET NULL', onupdate='CASCADE'), unique=False, nullable=True)
     __table_args__ = (
         CheckConstraint('level BETWEEN 0 AND 5'),
         CheckConstraint('student_limit > 0'),
+        CheckConstraint('enrolled_count >= 0'),
     )
     
 
 class Class(db.Model):
     __tablename__ = 'class'
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
-    date = db.Column(db.DateTime, nullable=False)
+    date = db.Column(db.DateTime, nullable=False, index=True)
     classroom_id = db.Column(db.Integer, ForeignKey('classroom.id', ondelete='CASCADE', onupdate='CASCADE'), nullable=False)
     course_id = db.Column(db.Integer, ForeignKey('course.id', ondelete='CASCADE', onupdate='CASCADE'), nullable=False)
+    __table_args__ = (
+        # Agenda windows filtered by classroom
+        db.Index('ix_class_classroom_date', 'classroom_id', 'date'),
+    )
 
 
 class Enrollment(db.Model):
@@ -0,0 +1,148 @@
+import threading
+import time
+from collections import deque
+from sqlalchemy import event, exc
+from sqlalchemy.pool import QueuePool
+
+# Checkout waits kept per pool for the percentiles
+WAIT_SAMPLES = 1000
+
+
+class PoolStats:
+    """Counters and recent checkout waits of one connection pool.
+
+    Connections opened and overflow connections are counted from the pool's
+    connect / close events; an overflow connection is one opened while
+    pool_size connections are already open.
+    """
+
+    def __init__(self, pool_size):
+        self.pool_size = pool_size
+        self.checkouts = 0
+        self.timeouts = 0
+        self.connects = 0
+        self.overflow_connects = 0
+        self.open = 0
+        self.peak_checked_out = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.waits = deque(maxlen=WAIT_SAMPLES)
+        self._lock = threading.Lock()
+
+    def record_checkout(self, wait, checked_out):
+        with self._lock:
+            self.checkouts += 1
+            self.wait_total += wait
+            self.wait_max = max(self.wait_max, wait)
+            self.waits.append(wait)
+            self.peak_checked_out = max(self.peak_checked_out, checked_out)
+
+    def record_timeout(self, wait):
+        with self._lock:
+            self.timeouts += 1
+            self.wait_max = max(self.wait_max, wait)
+
+    def on_connect(self, dbapi_connection, connection_record):
+        with self._lock:
+            self.connects += 1
+            if self.open >= self.pool_size:
+                self.overflow_connects += 1
+            self.open += 1
+
+    def on_close(self, dbapi_connection, connection_record):
+        with self._lock:
+            self.open -= 1
+
+    def on_close_detached(self, dbapi_connection):
+        with self._lock:
+            self.open -= 1
+
+    def listen(self, pool):
+        event.listen(pool, "connect", self.on_connect)
+        event.listen(pool, "close", self.on_close)
+        event.listen(pool, "close_detached", self.on_close_detached)
+
+    def unlisten(self, pool):
+        event.remove(pool, "connect", self.on_connect)
+        event.remove(pool, "close", self.on_close)
+        event.remove(pool, "close_detached", self.on_close_detached)
+
+    def snapshot(self):
+        with self._lock:
+            waits = sorted(self.waits)
+            checkouts = self.checkouts
+            data = {
+                "checkouts": checkouts,
+                "timeouts": self.timeouts,
+                "connects": self.connects,
+                "overflow_connects": self.overflow_connects,
+                "peak_checked_out": self.peak_checked_out,
+                "wait_avg_ms": self.wait_total / checkouts * 1000 if checkouts else 0.0,
+                "wait_max_ms": self.wait_max * 1000,
+            }
+        for pct in (50, 95, 99):
+            data[f"wait_p{pct}_ms"] = waits[min(len(waits) - 1, len(waits) * pct // 100)] * 1000 if waits else 0.0
+        return data
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records checkout waits, timeouts and overflow connections.
+
+    Used as the `poolclass` of every engine, so the admin pool page can tell
+    an exhausted pool (long waits, timeouts, overflow in use) from slow queries.
+    Only the public connect() is wrapped, to time the wait for a connection;
+    everything else comes from pool events.
+    """
+
+    def __init__(self, creator, pool_size=5, max_overflow=10, timeout=30.0, **kw):
+        super().__init__(creator, pool_size=pool_size, max_overflow=max_overflow, timeout=timeout, **kw)
+        # Kept from the arguments, so status() reads no private QueuePool attributes
+        self.settings = {
+            "max_overflow": max_overflow,
+            "timeout": timeout,
+            "recycle": kw.get("recycle", -1),
+            "pre_ping": kw.get("pre_ping", False),
+        }
+        self.stats = PoolStats(pool_size)
+        self.stats.listen(self)
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            connection = super().connect()
+        except exc.TimeoutError:
+            self.stats.record_timeout(time.perf_counter() - start)
+            raise
+        self.stats.record_checkout(time.perf_counter() - start, self.checkedout())
+        return connection
+
+    def recreate(self):
+        # dispose() swaps in a new pool, which copies our event listeners (and
+        # so keeps feeding our stats); drop the ones for its own fresh stats
+        pool = super().recreate()
+        pool.stats.unlisten(pool)
+        pool.stats = self.stats
+        return pool
+
+    def status(self):
+        return {
+            "size": self.size(),
+            **self.settings,
+            "checked_out": self.checkedout(),
+            "idle": self.checkedin(),
+            "overflow_in_use": max(0, self.overflow()),
+            **self.stats.snapshot(),
+        }
+
+
+def engine_pool_status(engines):
+    """Pool status of every Flask-SQLAlchemy engine, keyed by bind name."""
+    status = {}
+    for bind, engine in engines.items():
+        pool = engine.pool
+        name = bind or "default"
+        if isinstance(pool, InstrumentedQueuePool):
+            status[name] = pool.status()
+        else:
+            status[name] = {"pool": type(pool).__name__, "status": pool.status()}
+    return status
@@ -0,0 +1,83 @@
+import cProfile
+import io
+import os
+import pstats
+import re
+import time
+from datetime import datetime
+from flask import g, request
+from flask_login import current_user
+
+PROFILE_DIR = os.getenv("PROFILE_DIR") or os.path.join(os.path.dirname(os.path.abspath(__file__)), "profiles")
+# Oldest profiles are deleted past this many files
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", 50))
+PROFILE_PARAM = "_profile"
+PROFILE_HEADER = "X-Profile"
+
+_PROFILE_NAME = re.compile(r"^[\w.-]+\.prof$")
+
+
+def _wants_profile():
+    # Plain string lookups first, so requests that don't ask never load the user for this
+    if PROFILE_PARAM not in request.args and PROFILE_HEADER not in request.headers:
+        return False
+    return current_user.is_authenticated and current_user.has_role("admin")
+
+
+def _start_profile():
+    if _wants_profile():
+        g.profiler = cProfile.Profile()
+        g.profile_start = time.perf_counter()
+        g.profiler.enable()
+
+
+def _save_profile(exc):
+    profiler = g.pop("profiler", None)
+    if profiler is None:
+        return
+    profiler.disable()
+    elapsed_ms = (time.perf_counter() - g.pop("profile_start")) * 1000
+
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    endpoint = re.sub(r"[^\w.-]", "_", request.endpoint or "unmatched")
+    name = f"{datetime.now():%Y%m%d-%H%M%S-%f}-{endpoint}-{elapsed_ms:.0f}ms.prof"
+    profiler.dump_stats(os.path.join(PROFILE_DIR, name))
+
+    for old in list_profiles()[PROFILE_KEEP:]:
+        os.remove(profile_path(old["name"]))
+
+
+def profile_path(name):
+    """Path of a saved profile, or None when the name isn't one of ours."""
+    if not _PROFILE_NAME.match(name):
+        return None
+    path = os.path.join(PROFILE_DIR, name)
+    return path if os.path.isfile(path) else None
+
+
+def list_profiles():
+    """Saved profiles, newest first."""
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    profiles = []
+    for name in os.listdir(PROFILE_DIR):
+        if not _PROFILE_NAME.match(name):
+            continue
+        stat = os.stat(os.path.join(PROFILE_DIR, name))
+        profiles.append({"name": name, "size": stat.st_size, "created_at": datetime.fromtimestamp(stat.st_mtime)})
+    return sorted(profiles, key=lambda p: p["name"], reverse=True)
+
+
+def profile_report(name, sort="cumulative", limit=60):
+    path = profile_path(name)
+    if path is None:
+        return None
+    out = io.StringIO()
+    stats = pstats.Stats(path, stream=out)
+    stats.strip_dirs().sort_stats(sort).print_stats(limit)
+    return out.getvalue()
+
+
+def init_profiler(app):
+    app.before_request(_start_profile)
+    app.teardown_request(_save_profile)
@@ -0,0 +1,52 @@
+import hmac
+from flask import Blueprint, jsonify, request, abort, render_template, send_file, current_app
+from flask_login import login_required, current_user
+from controllers.auth_controller import roles_required
+from models import db
+from metrics import request_metrics, METRICS_TOKEN
+from pool_stats import engine_pool_status
+from profiler import list_profiles, profile_path, profile_report, PROFILE_PARAM
+
+admin_bp = Blueprint('admin', __name__, url_prefix='/admin')
+metrics_bp = Blueprint('metrics', __name__)
+
+
+@admin_bp.route("/pool")
+@login_required
+@roles_required("admin")
+def pool_status():
+    return jsonify(engine_pool_status(db.engines))
+
+
+@admin_bp.route("/profiles")
+@login_required
+@roles_required("admin")
+def profiles():
+    return render_template("admin/profiles.html", profiles=list_profiles(), profile_param=PROFILE_PARAM)
+
+
+@admin_bp.route("/profiles/<name>")
+@login_required
+@roles_required("admin")
+def profile_detail(name):
+    path = profile_path(name)
+    if path is None:
+        abort(404)
+    if request.args.get("download"):
+        return send_file(path, as_attachment=True, download_name=name)
+    sort = request.args.get("sort", "cumulative")
+    if sort not in ("cumulative", "tottime", "ncalls"):
+        sort = "cumulative"
+    return render_template("admin/profile.html", name=name, sort=sort, report=profile_report(name, sort))
+
+
+@metrics_bp.route("/metrics")
+def metrics():
+    # Admins can open it in the browser; a scraper sends the METRICS_TOKEN instead
+    token = request.headers.get("Authorization", "").removeprefix("Bearer ")
+    if not (METRICS_TOKEN and hmac.compare_digest(token, METRICS_TOKEN)):
+        if not current_user.is_authenticated:
+            abort(401)
+        if not current_user.has_role("admin"):
+            abort(403)
+    return request_metrics.render(current_app.config.get("STARTUP_TIMINGS")), 200, {"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
@@ -1,38 +1,39 @@
-from flask import render_template, request, redirect, url_for
-from main import app
+from flask import Blueprint, render_template, request, redirect, url_for
 from controllers.auth_controller import authenticate, login, logout, is_logged_in
 from flask_login import login_required, current_user
 
-@app.route("/")
+main_bp = Blueprint('main', __name__)
+
+@main_bp.route("/")
 def home():
     if is_logged_in():
-        return redirect(url_for("dashboard"))
-    return redirect(url_for("login_get"))
+        return redirect(url_for("main.dashboard"))
+    return redirect(url_for("main.login_get"))
 
-@app.route("/login", methods=["GET"])
+@main_bp.route("/login", methods=["GET"])
 def login_get():
     if is_logged_in():
-        return redirect(url_for("dashboard"))
+        return redirect(url_for("main.dashboard"))
     return render_template("login.html")
 
-@app.route("/login", methods=["POST"])
+@main_bp.route("/login", methods=["POST"])
 def login_post():
     username = request.form.get("email")
     password = request.form.get("password")
     user = authenticate(username, password)
     if user:
         login(user)
-        return redirect(url_for("dashboard"))
+        return redirect(url_for("main.dashboard"))
     else:
         return render_template("login.html", error="Invalid credentials.")
 
-@app.route("/dashboard")
+@main_bp.route("/dashboard")
 @login_required
 def dashboard():
     return render_template("dashboard.html", user=current_user)
 
-@app.route("/logout")
+@main_bp.route("/logout")
 @login_required
 def logout_route():
     logout()
-    return redirect(url_for("login_get"))
+    return redirect(url_for("main.login_get"))
@@ -1,35 +1,74 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, abort
 from flask_login import login_required
 from controllers.auth_controller import roles_required
 from controllers.presentations_controller import (
-    get_all_presentations,
+    get_presentation_summaries,
+    presentation_summaries_query,
     create_presentation,
     get_presentation,
     update_presentation,
-    delete_presentation
+    delete_presentation,
+    search_students,
+    get_students_by_ids,
+    get_presentation_student_ids,
+    STUDENT_SEARCH_PAGE_SIZE
 )
-from models import Amphitheater, Conductor, Student
-from datetime import datetime
+from controllers.reference_controller import reference_cache
+from controllers.export_controller import export_statement, export_response, EXPORT_FORMATS
+from sql_tracker import query_budget
+from datetime import datetime, timedelta
 
 presentations_bp = Blueprint('presentations', __name__, url_prefix='/presentations')
 
 
+def _date_filters():
+    """The from / to query arguments as a [date_from, date_to) window, plus the raw strings."""
+    date_from_str = request.args.get("from", "")
+    date_to_str = request.args.get("to", "")
+    try:
+        date_from = datetime.fromisoformat(date_from_str) if date_from_str else None
+        # The "to" date is inclusive, so filter up to the start of the next day
+        date_to = datetime.fromisoformat(date_to_str) + timedelta(days=1) if date_to_str else None
+    except ValueError:
+        flash("Invalid date filter", "danger")
+        return None, None, "", ""
+    return date_from, date_to, date_from_str, date_to_str
+
+
 @presentations_bp.route("/")
 @login_required
 # @roles_required("admin", "secretary")
+@query_budget(3)
 def list_presentations():
-    presentations = get_all_presentations()
-    return render_template("presentations/list.html", presentations=presentations)
+    page = request.args.get("page", 1, type=int)
+    date_from, date_to, date_from_str, date_to_str = _date_filters()
+
+    presentations, has_next = get_presentation_summaries(date_from, date_to, page)
+    return render_template(
+        "presentations/list.html",
+        presentations=presentations,
+        page=page,
+        has_next=has_next,
+        date_from=date_from_str,
+        date_to=date_to_str
+    )
+
+
+@presentations_bp.route("/export.<fmt>")
+@login_required
+def export_presentations(fmt):
+    if fmt not in EXPORT_FORMATS:
+        abort(404)
+    date_from, date_to, _, _ = _date_filters()
+    query = presentation_summaries_query(date_from, date_to)
+    return export_response(export_statement(query.statement, fmt), fmt, "presentations")
 
 
 @presentations_bp.route("/create", methods=["GET", "POST"])
 @login_required
 @roles_required("admin", "secretary")
+@query_budget(6)
 def create_presentation_route():
-    amphitheaters = Amphitheater.query.all()
-    conductors = Conductor.query.all()
-    students = Student.query.all()
-
     if request.method == "POST":
         title = request.form.get("title")
         date_str = request.form.get("date")
@@ -40,32 +79,33 @@ def create_presentation_route():
         conductor_id = int(request.form.get("conductor_id"))
         student_ids = [int(sid) for sid in request.form.getlist("student_ids")]
 
-        presentation, error = create_presentation(
+        presentation, errors = create_presentation(
             title, date, level, guest_number, amphitheater_id, conductor_id, student_ids
         )
-        if error:
-            flash(error, "danger")
+        if errors:
+            for error in errors:
+                flash(error["message"], "danger")
             return redirect(url_for("presentations.create_presentation_route"))
 
         flash("Presentation created successfully", "success")
         return redirect(url_for("presentations.list_presentations"))
 
-    return render_template("presentations/create.html", amphitheaters=amphitheaters, conductors=conductors, students=students)
+    reference = reference_cache.get()
+    amphitheaters = reference.sorted("amphitheaters")
+    conductors = reference.sorted("conductors")
+    return render_template("presentations/create.html", amphitheaters=amphitheaters, conductors=conductors, students=[])
 
 
 @presentations_bp.route("/<int:presentation_id>/edit", methods=["GET", "POST"])
 @login_required
 @roles_required("admin", "secretary")
+@query_budget(8)
 def edit_presentation_route(presentation_id):
     presentation = get_presentation(presentation_id)
     if not presentation:
         flash("Presentation not found", "danger")
         return redirect(url_for("presentations.list_presentations"))
 
-    amphitheaters = Amphitheater.query.all()
-    conductors = Conductor.query.all()
-    students = Student.query.all()
-
     if request.method == "POST":
         title = request.form.get("title")
         date = datetime.fromisoformat(request.form.get("date"))
@@ -75,19 +115,42 @@ def edit_presentation_route(presentation_id):
         conductor_id = int(request.form.get("conductor_id"))
         student_ids = [int(sid) for sid in request.form.getlist("student_ids")]
 
-        updated, error = update_presentation(
+        updated, errors = update_presentation(
             presentation, title, date, level, guest_number, amphitheater_id, conductor_id, student_ids
         )
-        if error:
-            flash(error, "danger")
+        if errors:
+            for error in errors:
+                flash(error["message"], "danger")
             return redirect(url_for("presentations.edit_presentation_route", presentation_id=presentation.id))
 
         flash("Presentation updated successfully", "success")
         return redirect(url_for("presentations.list_presentations"))
 
+    reference = reference_cache.get()
+    amphitheaters = reference.sorted("amphitheaters")
+    conductors = reference.sorted("conductors")
+    # Only the current participants are rendered; the picker searches for the rest
+    students = get_students_by_ids(get_presentation_student_ids(presentation.id))
     return render_template("presentations/edit.html", presentation=presentation, amphitheaters=amphitheaters, conductors=conductors, students=students)
 
 
+@presentations_bp.route("/students/search")
+@login_required
+@roles_required("admin", "secretary")
+@query_budget(2)
+def search_students_route():
+    students, next_cursor = search_students(
+        name_prefix=request.args.get("q", "").strip() or None,
+        min_level=request.args.get("min_level", 0, type=int),
+        after=request.args.get("after"),
+        per_page=request.args.get("per_page", STUDENT_SEARCH_PAGE_SIZE, type=int)
+    )
+    return jsonify(
+        students=[{"id": s.id, "name": s.name, "level": s.level} for s in students],
+        next=next_cursor
+    )
+
+
 @presentations_bp.route("/<int:presentation_id>/delete", methods=["POST"])
 @login_required
 @roles_required("admin", "secretary")
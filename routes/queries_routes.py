@@ -1,12 +1,16 @@
-from flask import Blueprint, render_template, request, flash
-from flask_login import login_required
+from flask import Blueprint, render_template, stream_template, request, flash, current_app, redirect, url_for, abort
+from flask_login import login_required, current_user
 from controllers.auth_controller import roles_required
-from controllers.queries_controller import get_courses_with_available_spots, get_students_never_participated, execute_query, get_predefined_queries
+from controllers.queries_controller import get_courses_with_available_spots, get_students_never_participated, execute_query, get_predefined_queries, query_history
+from controllers.export_controller import complete_rows, export_rows, export_response, EXPORT_FORMATS, QUERY_EXPORT_ROW_LIMIT
+from index_advisor import advise
+from sql_tracker import query_budget
 
 queries_bp = Blueprint('queries', __name__, url_prefix='/queries')
 
 @queries_bp.route('/available-spots')
 @login_required
+@query_budget(2)
 def available_spots():
     courses = get_courses_with_available_spots()
     return render_template('queries/available_spots.html', courses=courses)
@@ -14,6 +18,7 @@ def available_spots():
 @queries_bp.route("/students/no_participation")
 @login_required
 @roles_required("admin", "secretary")
+@query_budget(2)
 def students_never_participated():
     students = get_students_never_participated()
     return render_template("queries/students_no_participation.html", students=students)
@@ -26,19 +31,58 @@ def querymaker():
     results = None
     error = None
     explain_plan = None
+    index_advice = []
     query = ''
+    analyze = False
 
     if request.method == 'POST':
         query = request.form.get('sql_query', '')
-        results, error, explain_plan = execute_query(query)
+        analyze = request.form.get('analyze') == 'on'
+        results, error, explain_plan = execute_query(query, user_id=current_user.id, analyze=analyze)
         if error:
             flash(f"Error executing query: {error}", 'danger')
+        elif explain_plan:
+            index_advice = advise(query, explain_plan)
 
-    return render_template(
-        'queries/querymaker.html',
+    context = dict(
         queries=queries,
         results=results,
         error=error,
         explain_plan=explain_plan,
-        query=query
+        index_advice=index_advice,
+        query=query,
+        analyze=analyze,
+        history=query_history.for_user(current_user.id)
     )
+    if results is None:
+        return render_template('queries/querymaker.html', **context)
+
+    # Results come from a live cursor, so send the page while the rows are read
+    # and give the connection back once the response is done
+    page = stream_template('queries/querymaker.html', **context)
+    if results.profile:
+        page = results.profile.time_render(page)
+    response = current_app.response_class(page)
+    response.call_on_close(results.close)
+    return response
+
+
+@queries_bp.route('/querymaker/export', methods=['POST'])
+@login_required
+def export_query():
+    fmt = request.form.get('format', 'csv')
+    if fmt not in EXPORT_FORMATS:
+        abort(400)
+    results, error, _ = execute_query(
+        request.form.get('sql_query', ''),
+        row_limit=QUERY_EXPORT_ROW_LIMIT,
+        user_id=current_user.id,
+        export=True
+    )
+    if error:
+        flash(f"Error executing query: {error}", 'danger')
+        return redirect(url_for('queries.querymaker'))
+
+    response = export_response(export_rows(results.keys, complete_rows(results), fmt), fmt, "query")
+    response.call_on_close(results.close)
+    return response
@@ -1,16 +1,42 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash
+from flask import Blueprint, render_template, request, redirect, url_for, flash, abort
 from flask_login import login_required
 from controllers.auth_controller import roles_required, current_user
-from controllers.users_controller import get_all_users, create_user, get_user, update_user, delete_user
+from controllers.users_controller import get_users_page, create_user, get_user, update_user, delete_user, users_export_query, USERS_PAGE_SIZE
+from controllers.export_controller import export_statement, export_response, EXPORT_FORMATS
+from sql_tracker import query_budget
 
 users_bp = Blueprint('users', __name__, url_prefix='/users')
 
 @users_bp.route("/")
 @login_required
 @roles_required("admin", "secretary")
+@query_budget(3)
 def list_users():
-    users = get_all_users()
-    return render_template("users/list.html", users=users)
+    name_prefix = request.args.get("q", "").strip()
+    per_page = request.args.get("per_page", USERS_PAGE_SIZE, type=int)
+    users, next_cursor, prev_cursor = get_users_page(
+        after=request.args.get("after"),
+        before=request.args.get("before"),
+        name_prefix=name_prefix or None,
+        per_page=per_page
+    )
+    return render_template(
+        "users/list.html",
+        users=users,
+        next_cursor=next_cursor,
+        prev_cursor=prev_cursor,
+        name_prefix=name_prefix,
+        per_page=per_page
+    )
+
+@users_bp.route("/export.<fmt>")
+@login_required
+@roles_required("admin", "secretary")
+def export_users(fmt):
+    if fmt not in EXPORT_FORMATS:
+        abort(404)
+    query = users_export_query(request.args.get("q", "").strip() or None)
+    return export_response(export_statement(query, fmt), fmt, "users")
 
 @users_bp.route("/create", methods=["GET", "POST"])
 @login_required
@@ -64,7 +90,7 @@ def profile():
     user = get_user(current_user.id)
     if not user:
         flash("User not found.", "danger")
-        return redirect(url_for("dashboard"))
+        return redirect(url_for("main.dashboard"))
 
     if request.method == "POST":
         name = request.form.get("name")
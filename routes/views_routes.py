@@ -1,12 +1,65 @@
-from flask import Blueprint, render_template
+from flask import Blueprint, render_template, request, flash, abort
 from flask_login import login_required
 from controllers.auth_controller import roles_required
-from controllers.views_controller import get_all_classes_schedule
+from controllers.views_controller import get_classes_schedule, get_schedule_filters, classes_schedule_query
+from controllers.export_controller import export_statement, export_response, EXPORT_FORMATS
+from datetime import date, datetime, timedelta
+from sql_tracker import query_budget
 
 views_bp = Blueprint('views', __name__, url_prefix='/views')
 
+def _schedule_window():
+    """The [date_from, date_to) window from the query arguments; defaults to the current week (Monday to Sunday)."""
+    today = date.today()
+    week_start = today - timedelta(days=today.weekday())
+    try:
+        date_from = datetime.fromisoformat(request.args.get("from") or week_start.isoformat())
+        # The "to" date is inclusive, so filter up to the start of the next day
+        date_to = datetime.fromisoformat(request.args.get("to") or (week_start + timedelta(days=6)).isoformat()) + timedelta(days=1)
+    except ValueError:
+        flash("Invalid date filter", "danger")
+        date_from = datetime.combine(week_start, datetime.min.time())
+        date_to = date_from + timedelta(days=7)
+    return date_from, date_to
+
+
 @views_bp.route('/agenda-aulas')
 @login_required
+@query_budget(5)
 def classes_schedule():
-    agenda = get_all_classes_schedule()
-    return render_template('views/classes_schedule.html', agenda=agenda)
+    date_from, date_to = _schedule_window()
+    classroom_id = request.args.get("classroom_id", type=int)
+    professor_id = request.args.get("professor_id", type=int)
+
+    agenda = get_classes_schedule(date_from, date_to, classroom_id, professor_id)
+    classrooms, professors = get_schedule_filters()
+
+    window = date_to - date_from
+    return render_template(
+        'views/classes_schedule.html',
+        agenda=agenda,
+        classrooms=classrooms,
+        professors=professors,
+        classroom_id=classroom_id,
+        professor_id=professor_id,
+        date_from=date_from.date().isoformat(),
+        date_to=(date_to - timedelta(days=1)).date().isoformat(),
+        prev_from=(date_from - window).date().isoformat(),
+        prev_to=(date_from - timedelta(days=1)).date().isoformat(),
+        next_from=date_to.date().isoformat(),
+        next_to=(date_to + window - timedelta(days=1)).date().isoformat()
+    )
+
+
+@views_bp.route('/agenda-aulas/export.<fmt>')
+@login_required
+def export_classes_schedule(fmt):
+    if fmt not in EXPORT_FORMATS:
+        abort(404)
+    date_from, date_to = _schedule_window()
+    query = classes_schedule_query(
+        date_from, date_to,
+        request.args.get("classroom_id", type=int),
+        request.args.get("professor_id", type=int)
+    )
+    return export_response(export_statement(query, fmt), fmt, "agenda")
@@ -2,16 +2,67 @@
 import random
 from datetime import datetime, timedelta, time
 from faker import Faker
-from main import app, db 
+from models import db
 from models import User, Admin, Worker, Student, Maintenancer, Professor, Secretary, Conductor, \
     Dependency, Amphitheater, Classroom, Course, Class, Enrollment, Attendance, Participation, \
     Instrument, Maintenance, Presentation, Rehearsal
 from triggers import *
-from sqlalchemy import text
+from sqlalchemy import text, insert
 from views import create_views
+from werkzeug.security import generate_password_hash
+import argparse
+import time as timer
 
 fake = Faker()
 
+INSTRUMENT_OPTIONS = ["Violin", "Piano", "Flute", "Cello", "Harp", "Clarinet"]
+
+LEVEL_COURSE_NAMES = {
+    0: [  # Básico
+        "{} Fundamentals",
+        "Basics of {}",
+        "Intro to {}"
+    ],
+    1: [  # Iniciante
+        "Beginner's Guide to {}",
+        "{} for Starters",
+        "Getting Started with {}"
+    ],
+    2: [  # Aprendiz
+        "{} Apprenticeship",
+        "Apprentice {} Techniques",
+        "Developing {} Skills"
+    ],
+    3: [  # Intermediário
+        "Intermediate {} Studies",
+        "Building {} Techniques",
+        "{} Ensemble Playing"
+    ],
+    4: [  # Avançado
+        "Advanced {} Techniques",
+        "Mastering {}",
+        "Advanced {} Workshop"
+    ],
+    5: [  # Virtuoso
+        "Virtuoso {} Masterclass",
+        "Concert-Level {} Performance",
+        "Virtuoso {} Techniques"
+    ]
+}
+
+MUSIC_TITLES = [
+    "Symphony Under the Stars",
+    "Jazz & Moonlight",
+    "Echoes of the Violin",
+    "Harmony of the Winds",
+    "Piano Nights",
+    "The Choral Journey",
+    "Strings & Serenades",
+    "Rhythms of the World",
+    "Opera in the Park",
+    "Ballads and Beyond"
+]
+
 def seed_users(count=30):
     users = []
     for _ in range(count):
@@ -154,48 +205,13 @@ def seed_classrooms(deps):
     return classrooms
 
 def seed_courses(professors):
-    instrument_options = ["Violin", "Piano", "Flute", "Cello", "Harp", "Clarinet"]
-
-    level_course_names = {
-        0: [  # Básico
-            "{} Fundamentals",
-            "Basics of {}",
-            "Intro to {}"
-        ],
-        1: [  # Iniciante
-            "Beginner's Guide to {}",
-            "{} for Starters",
-            "Getting Started with {}"
-        ],
-        2: [  # Aprendiz
-            "{} Apprenticeship",
-            "Apprentice {} Techniques",
-            "Developing {} Skills"
-        ],
-        3: [  # Intermediário
-            "Intermediate {} Studies",
-            "Building {} Techniques",
-            "{} Ensemble Playing"
-        ],
-        4: [  # Avançado
-            "Advanced {} Techniques",
-            "Mastering {}",
-            "Advanced {} Workshop"
-        ],
-        5: [  # Virtuoso
-            "Virtuoso {} Masterclass",
-            "Concert-Level {} Performance",
-            "Virtuoso {} Techniques"
-        ]
-    }
-
     courses = []
     used_names = set()
 
     for prof in professors:
         level = random.randint(0, 5)
-        instrument = random.choice(instrument_options)
-        base_name = random.choice(level_course_names[level]).format(instrument)
+        instrument = random.choice(INSTRUMENT_OPTIONS)
+        base_name = random.choice(LEVEL_COURSE_NAMES[level]).format(instrument)
 
         # Make sure name is unique, add suffix if needed
         name = base_name
@@ -285,6 +301,13 @@ def seed_maintenance(instruments, maintenancers):
     
     db.session.flush()
 
+def random_presentation_date():
+    days_ahead = random.randint(-30, 30)
+    base_date = datetime.now() + timedelta(days=days_ahead)
+    base_date += timedelta(days=(5 - base_date.weekday()) % 7)
+    hour = random.randint(14, 22)
+    return datetime.combine(base_date.date(), time(hour=hour, minute=0))
+
 def seed_presentations(amphitheaters):
     presentations = []
 
@@ -295,11 +318,7 @@ def seed_presentations(amphitheaters):
 
         level = random.randint(0, 5)
 
-        days_ahead = random.randint(-30, 30)
-        base_date = datetime.now() + timedelta(days=days_ahead)
-        base_date += timedelta(days=(5 - base_date.weekday()) % 7)
-        hour = random.randint(14, 22)
-        date = datetime.combine(base_date.date(), time(hour=hour, minute=0))
+        date = random_presentation_date()
 
         conductor_user = User(
             name=fake.name(),
@@ -347,19 +366,7 @@ def seed_presentations(amphitheaters):
             db.session.add(student)
             students.append(student)
 
-        music_titles = [
-            "Symphony Under the Stars",
-            "Jazz & Moonlight",
-            "Echoes of the Violin",
-            "Harmony of the Winds",
-            "Piano Nights",
-            "The Choral Journey",
-            "Strings & Serenades",
-            "Rhythms of the World",
-            "Opera in the Park",
-            "Ballads and Beyond"
-        ]
-        title = random.choice(music_titles)
+        title = random.choice(MUSIC_TITLES)
 
         pres = Presentation(
             title=title,
@@ -396,32 +403,34 @@ def run_and_print(func, *args):
     return func(*args)
 
 def seed_all():
-    with app.app_context():
-        db.drop_all()
-        db.create_all()
-
-        users = run_and_print(seed_users)
-        admins, workers, students = run_and_print(seed_user_specializations, users)
-        professors, secretaries, maintenancers = run_and_print(seed_worker_specializations)             
-        conductors = run_and_print(seed_conductors, professors)
-        deps = run_and_print(seed_dependencies)
-        amphitheaters = run_and_print(seed_amphitheaters, deps)
-        classrooms = run_and_print(seed_classrooms, deps)
-        instruments = run_and_print(seed_instruments, deps)
-        courses = run_and_print(seed_courses, professors)
-        classes = run_and_print(seed_classes, classrooms, courses)
-        run_and_print(seed_enrollments, students, courses)
-        run_and_print(seed_attendance, students, classes)
-        run_and_print(seed_maintenance, instruments, maintenancers)
-        presentations = run_and_print(seed_presentations, amphitheaters)
-        run_and_print(seed_participations, students, presentations)
-        run_and_print(seed_rehearsals, amphitheaters, presentations)
-
-        db.session.commit()
+    db.drop_all()
+    db.create_all()
+
+    users = run_and_print(seed_users)
+    admins, workers, students = run_and_print(seed_user_specializations, users)
+    professors, secretaries, maintenancers = run_and_print(seed_worker_specializations)             
+    conductors = run_and_print(seed_conductors, professors)
+    deps = run_and_print(seed_dependencies)
+    amphitheaters = run_and_print(seed_amphitheaters, deps)
+    classrooms = run_and_print(seed_classrooms, deps)
+    instruments = run_and_print(seed_instruments, deps)
+    courses = run_and_print(seed_courses, professors)
+    classes = run_and_print(seed_classes, classrooms, courses)
+    run_and_print(seed_enrollments, students, courses)
+    run_and_print(seed_attendance, students, classes)
+    run_and_print(seed_maintenance, instruments, maintenancers)
+    presentations = run_and_print(seed_presentations, amphitheaters)
+    run_and_print(seed_participations, students, presentations)
+    run_and_print(seed_rehearsals, amphitheaters, presentations)
+
+    db.session.commit()
         
 
-def reset_and_seed():
-    """Empties the database and calls seed_all()."""
+def reset_and_seed(bulk=False, scale=1):
+    """Empties the database and calls seed_all() (or seed_all_bulk() when bulk is set).
+
+    Like every seeding function, runs inside the caller's app context.
+    """
     print("Dropping all tables...")
     db.drop_all()
 
@@ -433,14 +442,242 @@ def reset_and_seed():
     create_views()
 
     print("Seeding database...")
-    seed_all()
+    if bulk:
+        seed_all_bulk(scale)
+    else:
+        seed_all()
     
     
 
     print("Database reset and seeded successfully.")
 
 
+# ---------------------------------------------------------------------------
+# Bulk seeding
+#
+# Same data shape as seed_all(), but rows are generated as plain dicts and
+# written with one executemany (multi-row INSERT) per batch instead of one
+# ORM object and round trip per row. Primary keys are assigned here, which is
+# safe because the tables were just recreated, so foreign keys can be filled
+# without reading ids back from the database.
+# ---------------------------------------------------------------------------
+
+BULK_BATCH_SIZE = 5000
+
+
+class BulkInserter:
+    """Inserts rows in batches and keeps per-table timing."""
+
+    def __init__(self, batch_size=BULK_BATCH_SIZE):
+        self.batch_size = batch_size
+        self.stats = {}
+
+    def insert(self, model, rows):
+        table = model.__table__
+        start = timer.perf_counter()
+        for i in range(0, len(rows), self.batch_size):
+            db.session.execute(insert(table), rows[i:i + self.batch_size])
+        elapsed = timer.perf_counter() - start
+
+        count, total = self.stats.get(table.name, (0, 0.0))
+        self.stats[table.name] = (count + len(rows), total + elapsed)
+        return rows
+
+    def report(self):
+        print(f"{'table':<15}{'rows':>10}{'seconds':>10}{'rows/s':>12}")
+        for name, (count, elapsed) in self.stats.items():
+            rate = count / elapsed if elapsed else float("inf")
+            print(f"{name:<15}{count:>10}{elapsed:>10.2f}{rate:>12.0f}")
+
+
+def seed_all_bulk(scale=1):
+    """Seeds every table with scale times the entity counts used by seed_all()."""
+    db.drop_all()
+    db.create_all()
+
+    bulk = BulkInserter()
+    # Every seeded user shares the same password, so hash it only once
+    password_hash = generate_password_hash("123456")
+
+    # Users: base users split into admins / workers / students, plus the
+    # conductor and students created for each presentation
+    base_user_count = 30 * scale
+    presentation_count = 3 * scale
+    presentation_students = [random.randint(5, 15) for _ in range(presentation_count)]
+    user_count = base_user_count + presentation_count + sum(presentation_students)
+
+    users = [
+        {"id": i, "name": fake.name(), "email": f"user{i}@{fake.free_email_domain()}", "password": password_hash}
+        for i in range(1, user_count + 1)
+    ]
+    bulk.insert(User, users)
+
+    split1 = base_user_count // 3
+    split2 = 2 * base_user_count // 3
+    admins = [{"user_id": user_id} for user_id in range(1, split1 + 1)]
+    bulk.insert(Admin, admins)
+
+    # Presentation conductors come right after the base users
+    worker_user_ids = list(range(split1 + 1, split2 + 1))
+    presentation_worker_user_ids = list(range(base_user_count + 1, base_user_count + presentation_count + 1))
+    workers = [
+        {"id": i, "user_id": user_id, "salary": round(random.uniform(1000, 5000), 2)}
+        for i, user_id in enumerate(worker_user_ids + presentation_worker_user_ids, start=1)
+    ]
+    bulk.insert(Worker, workers)
+
+    students = [
+        {"id": i, "user_id": user_id, "age": random.randint(10, 85),
+         "phone_number": fake.phone_number(), "level": random.randint(0, 5)}
+        for i, user_id in enumerate(range(split2 + 1, base_user_count + 1), start=1)
+    ]
+    base_student_ids = [s["id"] for s in students]
+
+    # Worker specializations, split in thirds like seed_worker_specializations()
+    base_worker_ids = [w["id"] for w in workers[:len(worker_user_ids)]]
+    wsplit1 = len(base_worker_ids) // 3
+    wsplit2 = 2 * len(base_worker_ids) // 3
+    presentation_worker_ids = [w["id"] for w in workers[len(worker_user_ids):]]
+
+    professors = [
+        {"id": i, "worker_id": worker_id, "academic_bg": fake.text(max_nb_chars=100)}
+        for i, worker_id in enumerate(base_worker_ids[:wsplit1] + presentation_worker_ids, start=1)
+    ]
+    base_professor_ids = [p["id"] for p in professors[:wsplit1]]
+    presentation_professor_ids = [p["id"] for p in professors[wsplit1:]]
+    secretaries = [
+        {"id": i, "worker_id": worker_id, "sector": fake.job()}
+        for i, worker_id in enumerate(base_worker_ids[wsplit1:wsplit2], start=1)
+    ]
+    maintenancers = [
+        {"id": i, "worker_id": worker_id, "outsourced_worker": random.choice([True, False])}
+        for i, worker_id in enumerate(base_worker_ids[wsplit2:], start=1)
+    ]
+    bulk.insert(Professor, professors)
+    bulk.insert(Secretary, secretaries)
+    bulk.insert(Maintenancer, maintenancers)
+
+    dependencies = [
+        {"id": i, "name": f"{fake.city()} {random.choice(['Hall', 'Center', 'Theater', 'Auditorium', 'Stage', 'Venue'])} {i}"}
+        for i in range(1, 5 * scale + 1)
+    ]
+    bulk.insert(Dependency, dependencies)
+    dependency_ids = [d["id"] for d in dependencies]
+
+    amphitheaters = [
+        {"id": i, "dependency_id": dep_id, "guest_capacity": random.randint(50, 300)}
+        for i, dep_id in enumerate(random.sample(dependency_ids, k=min(4 * scale, len(dependency_ids))), start=1)
+    ]
+    classrooms = [
+        {"id": i, "dependency_id": dep_id, "ac_insulation": random.choice([True, False])}
+        for i, dep_id in enumerate(random.sample(dependency_ids, k=min(2 * scale, len(dependency_ids))), start=1)
+    ]
+    bulk.insert(Amphitheater, amphitheaters)
+    bulk.insert(Classroom, classrooms)
+
+    instruments = []
+    for status, count in (("APTO", 3), ("EM_MANUTENCAO", 1), ("DESATIVADO", 1)):
+        for _ in range(count * scale):
+            instruments.append({
+                "id": len(instruments) + 1,
+                "status": status,
+                "dependency_id": random.choice(dependency_ids) if status == "APTO" else None
+            })
+    bulk.insert(Instrument, instruments)
+
+    courses = []
+    for i, professor_id in enumerate(base_professor_ids, start=1):
+        level = random.randint(0, 5)
+        instrument = random.choice(INSTRUMENT_OPTIONS)
+        courses.append({
+            "id": i,
+            "name": f"{random.choice(LEVEL_COURSE_NAMES[level]).format(instrument)} {i}",
+            "level": level,
+            "instrument_focus": instrument,
+            "student_limit": random.randint(5, 30),
+            "professor_id": professor_id
+        })
+    bulk.insert(Course, courses)
+    course_ids = [c["id"] for c in courses]
+
+    classes = [
+        {"id": i, "date": fake.date_time_between(start_date='-30d', end_date='+30d'),
+         "classroom_id": random.choice(classrooms)["id"], "course_id": random.choice(course_ids)}
+        for i in range(1, 5 * scale + 1)
+    ] if course_ids and classrooms else []
+    bulk.insert(Class, classes)
+
+    # Presentations and the conductors / students created for them
+    amphitheater_by_id = {a["id"]: a for a in amphitheaters}
+    conductors = [
+        {"id": i, "professor_id": professor_id, "level": random.randint(0, 5)}
+        for i, professor_id in enumerate(base_professor_ids, start=1)
+    ]
+    presentations = []
+    participations = []
+    next_student_user_id = base_user_count + presentation_count + 1
+    for i, professor_id in enumerate(presentation_professor_ids, start=1):
+        amphitheater = amphitheater_by_id[random.choice(list(amphitheater_by_id))]
+        level = random.randint(0, 5)
+        conductor_id = len(conductors) + 1
+        conductors.append({"id": conductor_id, "professor_id": professor_id, "level": random.randint(level, 5)})
+        presentations.append({
+            "id": i,
+            "title": random.choice(MUSIC_TITLES),
+            "date": random_presentation_date(),
+            "level": level,
+            "guest_number": random.randint(0, amphitheater["guest_capacity"]),
+            "amphitheater_id": amphitheater["id"],
+            "conductor_id": conductor_id
+        })
+        for _ in range(presentation_students[i - 1]):
+            student_id = len(students) + 1
+            students.append({
+                "id": student_id, "user_id": next_student_user_id, "age": random.randint(10, 85),
+                "phone_number": fake.phone_number(), "level": random.randint(level, 5)
+            })
+            participations.append({"student_id": student_id, "presentation_id": i})
+            next_student_user_id += 1
+        for student_id in random.sample(base_student_ids, k=min(2, len(base_student_ids))):
+            participations.append({"student_id": student_id, "presentation_id": i})
+
+    bulk.insert(Student, students)
+    bulk.insert(Conductor, conductors)
+
+    bulk.insert(Enrollment, [
+        {"student_id": student_id, "course_id": random.choice(course_ids)}
+        for student_id in base_student_ids
+    ] if course_ids else [])
+    bulk.insert(Attendance, [
+        {"student_id": student_id, "class_id": cls["id"]}
+        for cls in classes
+        for student_id in random.sample(base_student_ids, k=min(2, len(base_student_ids)))
+    ])
+    bulk.insert(Maintenance, [
+        {"instrument_id": instr["id"], "maintenancer_id": random.choice(maintenancers)["id"]}
+        for instr in instruments if instr["status"] == "EM_MANUTENCAO"
+    ] if maintenancers else [])
+
+    bulk.insert(Presentation, presentations)
+    bulk.insert(Participation, participations)
+    bulk.insert(Rehearsal, [
+        {"date": fake.date_time_between(start_date='-10d', end_date='+10d'),
+         "amphitheater_id": random.choice(amphitheaters)["id"], "presentation_id": pres["id"]}
+        for pres in presentations
+    ])
+
+    db.session.commit()
+    bulk.report()
+
+
 if __name__ == "__main__":
-    with app.app_context():
-        reset_and_seed()
+    parser = argparse.ArgumentParser(description="Reset and seed the database.")
+    parser.add_argument("--bulk", action="store_true", help="insert rows in batches instead of one ORM object at a time")
+    parser.add_argument("--scale", type=int, default=1, help="multiplies every entity count (implies --bulk)")
+    args = parser.parse_args()
+
+    from main import create_app
+
+    with create_app(web=False).app_context():
+        reset_and_seed(bulk=args.bulk or args.scale != 1, scale=args.scale)
 
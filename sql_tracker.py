@@ -0,0 +1,138 @@
+import logging
+import os
+import re
+import time
+from collections import Counter, defaultdict
+from functools import wraps
+from flask import current_app, g, has_app_context, render_template, request
+from flask_login import current_user
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+# The same statement shape this many times in one request is reported as N+1
+N_PLUS_ONE_THRESHOLD = int(os.getenv("SQL_N_PLUS_ONE_THRESHOLD", 5))
+SQL_DEBUG_PANEL = os.getenv("SQL_DEBUG_PANEL", "false").lower() in ("1", "true", "yes")
+# Statements kept per request for the debug panel
+PANEL_STATEMENTS = 50
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER = r"(?:\?|%s|%\(\w+\)s|:\w+)"
+_PLACEHOLDER_LIST = re.compile(rf"\(\s*{_PLACEHOLDER}(?:\s*,\s*{_PLACEHOLDER})*\s*\)")
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def statement_shape(statement):
+    """The statement with literals and IN lists collapsed, so lazy loads of different rows compare equal."""
+    shape = _LITERALS.sub("?", statement)
+    shape = _PLACEHOLDER_LIST.sub("(?)", shape)
+    return " ".join(shape.split())
+
+
+class RequestQueries:
+    """Statements executed while serving one request."""
+
+    def __init__(self):
+        self.count = 0
+        self.total_time = 0.0
+        self.shapes = Counter()
+        self.shape_time = defaultdict(float)
+        self.statements = []
+
+    def record(self, statement, duration):
+        shape = statement_shape(statement)
+        self.count += 1
+        self.total_time += duration
+        self.shapes[shape] += 1
+        self.shape_time[shape] += duration
+        if len(self.statements) < PANEL_STATEMENTS:
+            self.statements.append((statement, duration))
+
+    def repeated(self, threshold=N_PLUS_ONE_THRESHOLD):
+        """(shape, count, total seconds) of every shape run at least `threshold` times."""
+        return [
+            (shape, count, self.shape_time[shape])
+            for shape, count in self.shapes.most_common()
+            if count >= threshold
+        ]
+
+
+def query_budget(max_queries):
+    """Declares how many statements a view may run.
+
+    Going over logs a warning, or raises QueryBudgetExceeded when the app has
+    SQL_QUERY_BUDGET_STRICT set (as the tests do).
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            return f(*args, **kwargs)
+        decorated_function.query_budget = max_queries
+        return decorated_function
+    return decorator
+
+
+# The start time lives on the execution context, which is dropped with the
+# statement, so statements that fail (and never reach after_cursor_execute)
+# leave nothing behind on the pooled connection
+@event.listens_for(Engine, "before_cursor_execute")
+def _start_timer(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._sql_tracker_start = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _record_statement(conn, cursor, statement, parameters, context, executemany):
+    start = getattr(context, "_sql_tracker_start", None)
+    duration = time.perf_counter() - start if start is not None else 0.0
+    if has_app_context():
+        queries = g.get("sql_queries")
+        if queries is not None:
+            queries.record(statement, duration)
+
+
+def _start_request():
+    g.sql_queries = RequestQueries()
+
+
+def _report_request(response):
+    queries = g.get("sql_queries")
+    if queries is None:
+        return response
+
+    response.headers["X-DB-Queries"] = str(queries.count)
+    response.headers["X-DB-Time-Ms"] = f"{queries.total_time * 1000:.1f}"
+
+    repeated = queries.repeated()
+    if repeated:
+        response.headers["X-DB-N-Plus-One"] = str(len(repeated))
+        for shape, count, _ in repeated:
+            logger.warning("Possible N+1 on %s: %d x %s", request.endpoint, count, shape[:200])
+
+    view = current_app.view_functions.get(request.endpoint)
+    budget = getattr(view, "query_budget", None)
+    if budget is not None and queries.count > budget:
+        message = f"{request.endpoint} ran {queries.count} statements, budget is {budget}"
+        if current_app.config.get("SQL_QUERY_BUDGET_STRICT"):
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
+
+    if (
+        SQL_DEBUG_PANEL
+        and response.mimetype == "text/html"
+        and not response.is_streamed
+        and current_user.is_authenticated
+        and current_user.has_role("admin")
+    ):
+        panel = render_template("debug/sql_panel.html", queries=queries, repeated=repeated)
+        response.set_data(response.get_data(as_text=True).replace("</body>", panel + "</body>", 1))
+    return response
+
+
+def init_sql_tracking(app):
+    app.before_request(_start_request)
+    app.after_request(_report_request)
@@ -0,0 +1,42 @@
+document.addEventListener("DOMContentLoaded", () => {
+    const picker = document.getElementById("student_picker");
+    const search = document.getElementById("student_search");
+    const select = document.getElementById("student_ids");
+    const more = document.getElementById("student_more");
+    const level = document.getElementById("level");
+    let next = null;
+    let timer = null;
+
+    function load(after) {
+        const params = new URLSearchParams({ q: search.value.trim(), min_level: level.value || 0 });
+        if (after) {
+            params.set("after", after);
+        }
+        fetch(`${picker.dataset.searchUrl}?${params}`)
+            .then((response) => response.json())
+            .then((data) => {
+                if (!after) {
+                    // Keep what is already selected, drop the previous matches
+                    Array.from(select.options).filter((option) => !option.selected).forEach((option) => option.remove());
+                }
+                const present = new Set(Array.from(select.options).map((option) => option.value));
+                data.students.forEach((student) => {
+                    if (!present.has(String(student.id))) {
+                        select.add(new Option(`${student.name} (Level: ${student.level})`, student.id));
+                    }
+                });
+                next = data.next;
+                more.hidden = !next;
+            });
+    }
+
+    function reload() {
+        clearTimeout(timer);
+        timer = setTimeout(() => load(null), 250);
+    }
+
+    search.addEventListener("input", reload);
+    level.addEventListener("change", reload);
+    more.addEventListener("click", () => load(next));
+    load(null);
+});
@@ -1,5 +1,7 @@
 from sqlalchemy.exc import IntegrityError, DataError, DBAPIError
-from main import app, db
+from flask import current_app
+from main import create_app
+from models import db
 from models import (
     User, Admin, Worker, Student, Maintenancer, Professor, Secretary, Conductor,
     Dependency, Amphitheater, Classroom, Course, Class, Instrument, Maintenance,
@@ -2178,6 +2180,524 @@ def run_integrity_tests():
             conn.close()
 
 
+    def test_enrollment_counter_triggers():
+        conn = db.engine.connect()
+        trans = conn.begin()
+        try:
+            result = conn.execute(text("""
+                INSERT INTO course (name, level, instrument_focus, student_limit, professor_id)
+                VALUES ('Curso Contador', 1, 'Cello', 5, NULL)
+            """))
+            course_id = result.lastrowid
+
+            student_ids = []
+            user_ids = []
+            for i in range(3):
+                result = conn.execute(text(f"INSERT INTO user (name, email, password) VALUES ('Student Count{i}', 'student_count{i}@example.com', 'pass')"))
+                user_ids.append(result.lastrowid)
+                result = conn.execute(text(f"INSERT INTO student (user_id, age, phone_number, level) VALUES ({user_ids[i]}, 20, '555-111{i}', 1)"))
+                student_ids.append(result.lastrowid)
+                conn.execute(text(f"INSERT INTO enrollment (student_id, course_id) VALUES ({student_ids[i]}, {course_id})"))
+
+            def enrolled_count():
+                return conn.execute(text(f"SELECT enrolled_count FROM course WHERE id = {course_id}")).scalar()
+
+            assert enrolled_count() == 3, f"enrolled_count after inserts: {enrolled_count()} != 3"
+
+            conn.execute(text(f"DELETE FROM enrollment WHERE student_id = {student_ids[0]} AND course_id = {course_id}"))
+            assert enrolled_count() == 2, f"enrolled_count after enrollment delete: {enrolled_count()} != 2"
+
+            # Enrollments removed by ON DELETE CASCADE must also give back the spot
+            conn.execute(text(f"DELETE FROM student WHERE id = {student_ids[1]}"))
+            assert enrolled_count() == 1, f"enrolled_count after student delete: {enrolled_count()} != 1"
+
+            conn.execute(text(f"DELETE FROM user WHERE id = {user_ids[2]}"))
+            assert enrolled_count() == 0, f"enrolled_count after user delete: {enrolled_count()} != 0"
+
+            trans.rollback()
+        finally:
+            conn.close()
+
+
+    def test_participation_stats_triggers():
+        conn = db.engine.connect()
+        trans = conn.begin()
+        try:
+            result = conn.execute(text("INSERT INTO dependency (name) VALUES ('Dep Stats')"))
+            dependency_id = result.lastrowid
+            result = conn.execute(text(f"INSERT INTO amphitheater (dependency_id, guest_capacity) VALUES ({dependency_id}, 100)"))
+            amphitheater_id = result.lastrowid
+
+            result = conn.execute(text("INSERT INTO user (name, email, password) VALUES ('Prof Stats', 'prof_stats@example.com', 'pass')"))
+            user_id = result.lastrowid
+            result = conn.execute(text(f"INSERT INTO worker (user_id, salary) VALUES ({user_id}, 3000)"))
+            worker_id = result.lastrowid
+            result = conn.execute(text(f"INSERT INTO professor (worker_id, academic_bg) VALUES ({worker_id}, 'PhD Stats')"))
+            professor_id = result.lastrowid
+            result = conn.execute(text(f"INSERT INTO conductor (professor_id, level) VALUES ({professor_id}, 5)"))
+            conductor_id = result.lastrowid
+
+            result = conn.execute(text("INSERT INTO user (name, email, password) VALUES ('Student Stats', 'student_stats@example.com', 'pass')"))
+            student_user_id = result.lastrowid
+            result = conn.execute(text(f"INSERT INTO student (user_id, age, phone_number, level) VALUES ({student_user_id}, 21, '555-2222', 5)"))
+            student_id = result.lastrowid
+
+            def stats():
+                return conn.execute(text(f"""
+                    SELECT participation_count, last_participation_date
+                    FROM student_participation_stats WHERE student_id = {student_id}
+                """)).fetchone()
+
+            row = stats()
+            assert row is not None, "student_participation_stats row not created for new student"
+            assert row[0] == 0 and row[1] is None, f"new student stats not empty: {row}"
+
+            presentation_ids = []
+            for day in ('2025-06-07 15:00:00', '2025-06-14 15:00:00'):
+                result = conn.execute(text(f"""
+                    INSERT INTO presentation (title, date, level, guest_number, amphitheater_id, conductor_id)
+                    VALUES ('Pres Stats', '{day}', 1, 10, {amphitheater_id}, {conductor_id})
+                """))
+                presentation_ids.append(result.lastrowid)
+                conn.execute(text(f"INSERT INTO participation (student_id, presentation_id) VALUES ({student_id}, {presentation_ids[-1]})"))
+
+            row = stats()
+            assert row[0] == 2, f"participation_count after inserts: {row[0]} != 2"
+            assert str(row[1]) == '2025-06-14 15:00:00', f"last_participation_date after inserts: {row[1]}"
+
+            conn.execute(text(f"UPDATE presentation SET date = '2025-05-31 15:00:00' WHERE id = {presentation_ids[1]}"))
+            row = stats()
+            assert str(row[1]) == '2025-06-07 15:00:00', f"last_participation_date after date change: {row[1]}"
+
+            conn.execute(text(f"DELETE FROM participation WHERE student_id = {student_id} AND presentation_id = {presentation_ids[0]}"))
+            row = stats()
+            assert row[0] == 1, f"participation_count after delete: {row[0]} != 1"
+            assert str(row[1]) == '2025-05-31 15:00:00', f"last_participation_date after delete: {row[1]}"
+
+            # Participations removed by ON DELETE CASCADE must be discounted too
+            conn.execute(text(f"DELETE FROM presentation WHERE id = {presentation_ids[1]}"))
+            row = stats()
+            assert row[0] == 0 and row[1] is None, f"stats after presentation delete: {row}"
+
+            trans.rollback()
+        finally:
+            conn.close()
+
+
+    def test_participation_stats_cascades():
+        # Deleting an amphitheater or a dependency cascades down to participation,
+        # which fires no trigger; the stats must still follow
+        conn = db.engine.connect()
+        trans = conn.begin()
+        try:
+            conductor_id = conn.execute(text("SELECT id FROM conductor LIMIT 1")).scalar()
+            result = conn.execute(text("INSERT INTO user (name, email, password) VALUES ('Student Cascade', 'student_cascade@example.com', 'pass')"))
+            student_user_id = result.lastrowid
+            result = conn.execute(text(f"INSERT INTO student (user_id, age, phone_number, level) VALUES ({student_user_id}, 21, '555-3333', 5)"))
+            student_id = result.lastrowid
+
+            amphitheaters = []
+            for name, day in (('Dep Cascade A', '2025-06-07 15:00:00'), ('Dep Cascade B', '2025-06-14 15:00:00'), ('Dep Cascade C', '2025-06-21 15:00:00')):
+                result = conn.execute(text(f"INSERT INTO dependency (name) VALUES ('{name}')"))
+                dependency_id = result.lastrowid
+                result = conn.execute(text(f"INSERT INTO amphitheater (dependency_id, guest_capacity) VALUES ({dependency_id}, 100)"))
+                amphitheater_id = result.lastrowid
+                amphitheaters.append((dependency_id, amphitheater_id))
+                # Two presentations per amphitheater, so one delete removes several participations
+                for hours in (0, 2):
+                    result = conn.execute(text(f"""
+                        INSERT INTO presentation (title, date, level, guest_number, amphitheater_id, conductor_id)
+                        VALUES ('Pres Cascade', DATE_ADD('{day}', INTERVAL {hours} HOUR), 1, 10, {amphitheater_id}, {conductor_id})
+                    """))
+                    conn.execute(text(f"INSERT INTO participation (student_id, presentation_id) VALUES ({student_id}, {result.lastrowid})"))
+
+            def stats():
+                return conn.execute(text(f"""
+                    SELECT participation_count, last_participation_date
+                    FROM student_participation_stats WHERE student_id = {student_id}
+                """)).fetchone()
+
+            row = stats()
+            assert row[0] == 6, f"participation_count after inserts: {row[0]} != 6"
+
+            conn.execute(text(f"DELETE FROM amphitheater WHERE id = {amphitheaters[2][1]}"))
+            row = stats()
+            assert row[0] == 4, f"participation_count after amphitheater delete: {row[0]} != 4"
+            assert str(row[1]) == '2025-06-14 17:00:00', f"last_participation_date after amphitheater delete: {row[1]}"
+
+            conn.execute(text(f"DELETE FROM dependency WHERE id = {amphitheaters[1][0]}"))
+            row = stats()
+            assert row[0] == 2, f"participation_count after dependency delete: {row[0]} != 2"
+            assert str(row[1]) == '2025-06-07 17:00:00', f"last_participation_date after dependency delete: {row[1]}"
+
+            trans.rollback()
+        finally:
+            conn.close()
+
+
+    def test_route_query_budgets():
+        # Routes declare a statement budget with @query_budget; strict mode turns overruns into failures
+        app = current_app._get_current_object()
+        admin_email = db.session.query(User.email).join(Admin, Admin.user_id == User.id).first()[0]
+        app.config["TESTING"] = True
+        app.config["SQL_QUERY_BUDGET_STRICT"] = True
+        try:
+            client = app.test_client()
+            response = client.post("/login", data={"email": admin_email, "password": "123456"})
+            assert response.status_code == 302, "Could not log in as the seeded admin"
+
+            for url in [
+                "/users/",
+                "/presentations/",
+                "/presentations/create",
+                "/presentations/students/search?q=a",
+                "/views/agenda-aulas",
+                "/queries/available-spots",
+                "/queries/students/no_participation"
+            ]:
+                response = client.get(url)
+                assert response.status_code == 200, f"{url} returned {response.status_code}"
+                assert "X-DB-N-Plus-One" not in response.headers, f"{url} repeats the same statement (N+1)"
+        finally:
+            app.config["TESTING"] = False
+            app.config["SQL_QUERY_BUDGET_STRICT"] = False
+
+    def test_startup_budget():
+        # create_app() records every startup phase and warns when one goes over its budget.
+        # Budgets are injected (0 and unlimited) so the result doesn't depend on the machine's speed
+        import logging
+        import main
+
+        class Captured(logging.Handler):
+            def __init__(self):
+                super().__init__()
+                self.messages = []
+
+            def emit(self, record):
+                self.messages.append(record.getMessage())
+
+        handler = Captured()
+        main.logger.addHandler(handler)
+        try:
+            timings = create_app({"STARTUP_BUDGET_MS": float("inf"), "FIRST_REQUEST_BUDGET_MS": float("inf")}).config["STARTUP_TIMINGS"]
+            for phase in ("import_ms", "create_app_ms", "prewarm_ms", "first_request_ms"):
+                assert timings.get(phase, -1) >= 0, f"startup phase {phase} not recorded: {timings}"
+            assert not handler.messages, f"warned within an unlimited budget: {handler.messages}"
+
+            create_app({"STARTUP_BUDGET_MS": 0, "FIRST_REQUEST_BUDGET_MS": 0})
+            assert any(m.startswith("Startup took") for m in handler.messages), "no warning over the startup budget"
+            assert any(m.startswith("First request took") for m in handler.messages), "no warning over the first request budget"
+        finally:
+            main.logger.removeHandler(handler)
+
+    def test_query_gate():
+        # Query Maker runs are capped per user and per process; the cap frees up on release
+        import threading
+        from controllers import queries_controller
+        from controllers.queries_controller import QueryGate, execute_query
+
+        gate = QueryGate(max_concurrent=2, max_per_user=1)
+        assert gate.acquire("a", timeout=0.05), "first query of a user refused"
+        assert not gate.acquire("a", timeout=0.05), "per-user limit not enforced"
+        assert gate.acquire("b", timeout=0.05), "second user refused below the global limit"
+        assert not gate.acquire("c", timeout=0.05), "global limit not enforced"
+        assert gate.acquire("c", timeout=0.05) is False and "c" not in gate._per_user, "refused user kept a per-user slot"
+
+        # A waiting query gets the slot as soon as one is released
+        threading.Timer(0.05, gate.release, args=("a",)).start()
+        assert gate.acquire("c", timeout=2), "slot not handed over after release"
+        gate.release("b")
+        gate.release("c")
+        assert gate.acquire("a", timeout=0.05) and gate.acquire("b", timeout=0.05), "slots not freed after release"
+
+        # execute_query reports a full gate instead of running the query
+        real_gate = queries_controller.query_gate
+        queries_controller.query_gate = QueryGate(max_concurrent=1, max_per_user=1)
+        try:
+            queries_controller.query_gate.acquire(0)
+            results, error, _ = execute_query("SELECT id FROM course WHERE id = -1", user_id=0)
+            assert results is None and error and "Too many queries" in error, f"full gate not reported: {error}"
+        finally:
+            queries_controller.query_gate = real_gate
+
+        # Every Query Maker connection carries its statement timeout
+        if db.engine.dialect.name == "mysql":
+            for export, timeout_ms in ((False, queries_controller.QUERY_TIMEOUT_MS), (True, queries_controller.QUERY_EXPORT_TIMEOUT_MS)):
+                with queries_controller.get_querymaker_engine(export).connect() as conn:
+                    applied = conn.execute(text("SELECT @@SESSION.max_execution_time")).scalar()
+                assert applied == timeout_ms, f"max_execution_time {applied} != {timeout_ms} (export={export})"
+
+    def test_principal_cache():
+        # Principals are cached with a TTL, dropped when role rows change, and roles_required checks their IntFlag roles
+        import time
+        from flask_login import login_user, logout_user
+        from werkzeug.exceptions import Forbidden, Unauthorized
+        from controllers.auth_controller import PrincipalCache, Principal, Role, principal_cache, get_principal, roles_required
+
+        cache = PrincipalCache(max_size=2, ttl=0.05)
+        cache.put(Principal(id=1, name="a", email="a"))
+        assert cache.get(1) is not None, "fresh principal not cached"
+        time.sleep(0.06)
+        assert cache.get(1) is None, "principal served past its TTL"
+        for user_id in (1, 2, 3):
+            cache.put(Principal(id=user_id, name="a", email="a"))
+        assert cache.get(1) is None and cache.get(3) is not None, "LRU did not evict the oldest principal"
+
+        user = User(name="Principal Cache", email="principal_cache@example.com", _password="pass")
+        db.session.add(user)
+        db.session.commit()
+        try:
+            principal_cache.clear()
+            assert get_principal(user.id).roles == Role(0), "new user has roles"
+            assert principal_cache.get(user.id) is not None, "principal not cached"
+
+            db.session.add(Admin(user_id=user.id))
+            db.session.flush()
+            db.session.rollback()
+            assert principal_cache.get(user.id) is not None, "rolled back role write dropped the cache"
+
+            db.session.add(Admin(user_id=user.id))
+            db.session.commit()
+            assert principal_cache.get(user.id) is None, "committed role write did not drop the cache"
+            assert get_principal(user.id).roles == Role.ADMIN, "new admin role not loaded"
+
+            db.session.delete(db.session.get(Admin, user.id))
+            db.session.commit()
+            assert get_principal(user.id).roles == Role(0), "removed admin role still cached"
+        finally:
+            db.session.delete(db.session.get(User, user.id))
+            db.session.commit()
+
+        @roles_required("admin", "secretary")
+        def view():
+            return "ok"
+
+        with current_app.test_request_context():
+            for roles, outcome in ((Role.SECRETARY | Role.WORKER, "ok"), (Role.ADMIN, "ok"), (Role.STUDENT, Forbidden), (Role(0), Forbidden)):
+                login_user(Principal(id=1, name="a", email="a", roles=roles))
+                try:
+                    result = view()
+                except Forbidden as e:
+                    result = type(e)
+                assert result == outcome, f"roles {roles!r}: {result} != {outcome}"
+            logout_user()
+            try:
+                view()
+            except Unauthorized:
+                pass
+            else:
+                raise AssertionError("anonymous user passed roles_required")
+
+    def test_users_keyset_pagination():
+        # Pages walk (name, id) in order both ways, ties on name included, and bad cursors fall back to page one
+        from controllers.users_controller import get_users_page
+        from controllers.query_helpers import encode_cursor
+        try:
+            for i, name in enumerate(["Keyset Ana", "Keyset Bia", "Keyset Bia", "Keyset Bia", "Keyset Bia", "Keyset Caio", "Keyset Duda"]):
+                db.session.add(User(name=name, email=f"keyset{i}@example.com", _password="pass"))
+            db.session.flush()
+            expected = [(u.name, u.id) for u in User.query.filter(User.name.like("Keyset %")).order_by(User.name, User.id)]
+
+            pages = []
+            users, next_cursor, prev_cursor = get_users_page(name_prefix="Keyset ", per_page=3)
+            assert prev_cursor is None, "first page has a previous cursor"
+            pages.append(([(u.name, u.id) for u in users], prev_cursor))
+            while next_cursor:
+                users, next_cursor, prev_cursor = get_users_page(after=next_cursor, name_prefix="Keyset ", per_page=3)
+                assert prev_cursor is not None, "page after the first has no previous cursor"
+                pages.append(([(u.name, u.id) for u in users], prev_cursor))
+            walked = [row for page, _ in pages for row in page]
+            assert walked == expected, f"forward walk {walked} != {expected}"
+            assert [len(page) for page, _ in pages] == [3, 3, 1], f"page sizes {[len(page) for page, _ in pages]}"
+
+            # Back from the last page, each previous cursor gives back the page before
+            for (page, _), (_, prev_cursor) in zip(reversed(pages[:-1]), reversed(pages[1:])):
+                users, _, _ = get_users_page(before=prev_cursor, name_prefix="Keyset ", per_page=3)
+                assert [(u.name, u.id) for u in users] == page, "backward walk returned a different page"
+            users, next_cursor, prev_cursor = get_users_page(before=pages[1][1], name_prefix="Keyset ", per_page=3)
+            assert prev_cursor is None and next_cursor is not None, "first page reached backwards has wrong cursors"
+
+            first_page = pages[0][0]
+            for cursor in ("not-a-cursor", "e30=", encode_cursor("Keyset", "x")):
+                users, _, _ = get_users_page(after=cursor, name_prefix="Keyset ", per_page=3)
+                assert [(u.name, u.id) for u in users] == first_page, f"tampered cursor {cursor!r} was not ignored"
+        finally:
+            db.session.rollback()
+
+    def test_presentation_summary_names():
+        # The aggregated student names of a presentation are complete, however long the list
+        from controllers.presentations_controller import presentation_summaries_query
+        try:
+            presentation = Presentation.query.first()
+            db.session.execute(text("DELETE FROM participation WHERE presentation_id = :id"), {"id": presentation.id})
+            names = []
+            for i in range(60):
+                name = f"Participante Com Nome Bastante Longo {i:02d}"
+                user_id = db.session.execute(
+                    text("INSERT INTO user (name, email, password) VALUES (:name, :email, 'pass')"),
+                    {"name": name, "email": f"summary_names{i}@example.com"}
+                ).lastrowid
+                student_id = db.session.execute(
+                    text("INSERT INTO student (user_id, age, phone_number, level) VALUES (:user_id, 20, '555-0000', 5)"),
+                    {"user_id": user_id}
+                ).lastrowid
+                db.session.execute(
+                    text("INSERT INTO participation (student_id, presentation_id) VALUES (:student_id, :presentation_id)"),
+                    {"student_id": student_id, "presentation_id": presentation.id}
+                )
+                names.append(name)
+
+            row = presentation_summaries_query().filter(Presentation.id == presentation.id).one()
+            listed = row.student_names.split(", ")
+            assert sorted(listed) == names, f"{len(listed)} of {len(names)} student names listed ({len(row.student_names)} chars)"
+        finally:
+            db.session.rollback()
+
+    def test_benchmark_percentile():
+        # Nearest rank: the smallest sample with at least pct% of the samples at or below it
+        from indexes_benchmark import percentile
+        assert percentile([], 50) is None, "percentile of no samples"
+        assert percentile(list(range(1, 11)), 50) == 5, "p50 of 10 samples is not the 5th"
+        assert percentile(list(range(1, 21)), 95) == 19, "p95 of 20 samples is not the 19th"
+        assert percentile(list(range(1, 101)), 95) == 95, "p95 of 100 samples is not the 95th"
+        assert percentile(list(range(1, 101)), 99) == 99, "p99 of 100 samples is not the 99th"
+        assert percentile([7], 99) == 7 and percentile([1, 2], 0) == 1, "percentile of tiny samples"
+
+    def test_query_cache_invalidation():
+        # Query Maker results are cached until a write reaches one of their tables,
+        # directly, through a trigger or through an FK cascade
+        from controllers.queries_controller import execute_query, query_cache, normalize_sql, CachedResult, QUERY_ROW_LIMIT
+
+        def run(sql):
+            results, error, _ = execute_query(sql, user_id=0)
+            assert error is None, f"{sql}: {error}"
+            rows = list(results)
+            results.close()
+            return results, rows
+
+        def cached(sql):
+            return query_cache.get((normalize_sql(sql), QUERY_ROW_LIMIT)) is not None
+
+        def write(sql):
+            conn = db.engine.connect()
+            try:
+                conn.execute(text(sql))
+                conn.rollback()
+            finally:
+                conn.close()
+
+        query_cache.clear()
+        courses = "SELECT id, enrolled_count FROM course ORDER BY id"
+        _, rows = run(courses)
+        assert cached(courses), "finished result was not cached"
+        results, cached_rows = run(courses)
+        assert isinstance(results, CachedResult), "second run did not hit the cache"
+        assert cached_rows == rows, "cached rows differ from the database"
+
+        write("UPDATE course SET level = level WHERE id = -1")
+        assert not cached(courses), "write to course did not invalidate its results"
+
+        # enrollment triggers change course.enrolled_count
+        run(courses)
+        write("DELETE FROM enrollment WHERE student_id = -1")
+        assert not cached(courses), "write to enrollment did not invalidate course results"
+
+        # presentation deletes cascade to rehearsal
+        rehearsals = "SELECT id FROM rehearsal"
+        run(rehearsals)
+        assert cached(rehearsals), "rehearsal result was not cached"
+        write("DELETE FROM presentation WHERE id = -1")
+        assert not cached(rehearsals), "delete from presentation did not invalidate rehearsal results"
+
+        # a WITH clause may front a write, so it is not treated as read-only
+        run(courses)
+        write("WITH gone AS (SELECT -1 AS id) DELETE FROM course WHERE id IN (SELECT id FROM gone)")
+        assert not cached(courses), "WITH ... DELETE did not invalidate course results"
+
+        # writes from other processes are not seen, so entries also expire
+        ttl, query_cache.ttl = query_cache.ttl, -1
+        try:
+            run(courses)
+            assert not cached(courses), "expired result was still served"
+        finally:
+            query_cache.ttl = ttl
+
+    def test_querymaker_repeat():
+        # Running the same query twice serves the second run from the cache; both pages must render
+        from controllers.queries_controller import query_cache
+        app = current_app._get_current_object()
+        admin_email = db.session.query(User.email).join(Admin, Admin.user_id == User.id).first()[0]
+        query_cache.clear()
+        client = app.test_client()
+        client.post("/login", data={"email": admin_email, "password": "123456"})
+        for run in ("first", "cached"):
+            response = client.post("/queries/querymaker", data={"sql_query": "SELECT id, name FROM course ORDER BY id"})
+            body = response.get_data(as_text=True)
+            response.close()
+            assert response.status_code == 200, f"{run} run returned {response.status_code}"
+            assert "Error executing query" not in body, f"{run} run reported an error"
+
+    def test_query_export_incomplete():
+        # An export cut short by the row limit must abort the stream, never end like a complete file
+        import routes.queries_routes as queries_routes
+        from controllers.export_controller import ExportIncomplete
+        app = current_app._get_current_object()
+        admin_email = db.session.query(User.email).join(Admin, Admin.user_id == User.id).first()[0]
+        row_limit = queries_routes.QUERY_EXPORT_ROW_LIMIT
+        queries_routes.QUERY_EXPORT_ROW_LIMIT = 2
+        try:
+            client = app.test_client()
+            client.post("/login", data={"email": admin_email, "password": "123456"})
+            response = client.post("/queries/querymaker/export", data={"sql_query": "SELECT id FROM user", "format": "csv"})
+            assert response.status_code == 200, f"export returned {response.status_code}"
+            try:
+                response.get_data()
+            except ExportIncomplete:
+                pass
+            else:
+                raise AssertionError("truncated export finished like a complete file")
+            finally:
+                response.close()
+
+            response = client.post("/queries/querymaker/export", data={"sql_query": "SELECT id FROM user LIMIT 2", "format": "csv"})
+            assert response.get_data(as_text=True).count("\n") == 3, "complete export is missing rows"
+        finally:
+            queries_routes.QUERY_EXPORT_ROW_LIMIT = row_limit
+
+    def test_bulk_loader():
+        # Enrollments loaded through the staging table fire the counter triggers; bad rows are rejected, not merged
+        import csv, os, tempfile
+        from bulk_loader import BulkLoader
+
+        course = Course(name="Curso Bulk", level=1, instrument_focus="Cello", student_limit=10)
+        db.session.add(course)
+        db.session.commit()
+        student_ids = [s.id for s in Student.query.limit(2)]
+        path = os.path.join(tempfile.mkdtemp(), "enrollments.csv")
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["student_id", "course_id"])
+            writer.writerows([[student_ids[0], course.id], [student_ids[1], course.id], [student_ids[0], course.id], [999999, course.id]])
+
+        loader = BulkLoader(Enrollment.__table__, chunk_size=2)
+        try:
+            stats = loader.load(path)
+            merged = sum(chunk["merged"] for chunk in stats)
+            assert merged == 2, f"merged {merged} rows, expected 2"
+            assert loader.rejected == 2, f"rejected {loader.rejected} rows, expected 2"
+            with open(loader.rejects_path, newline="") as f:
+                reasons = [row["reason"] for row in csv.DictReader(f)]
+            assert any("already exists" in reason for reason in reasons), reasons
+            assert any("no matching student" in reason for reason in reasons), reasons
+            db.session.refresh(course)
+            assert course.enrolled_count == 2, f"enrolled_count {course.enrolled_count} != 2"
+        finally:
+            db.session.delete(course)
+            db.session.commit()
+            for leftover in (path, loader.rejects_path):
+                if os.path.exists(leftover):
+                    os.remove(leftover)
+
 
     tests = [
         (test_conductor_bonus_trigger, "'conductor_bonus' trigger"),
@@ -2204,7 +2724,21 @@ def run_integrity_tests():
         (test_rehearsal_table_integrity, "rehearsal table integrity"),
         (test_vw_agenda_aulas, "vw agenda aulas"),
         (test_vw_participacao_apresentacoes, "vw participacao apresentacoes"),
-        (test_vw_cursos_com_vagas, "vw cursos com vagas")
+        (test_vw_cursos_com_vagas, "vw cursos com vagas"),
+        (test_enrollment_counter_triggers, "enrollment counter triggers"),
+        (test_participation_stats_triggers, "participation stats triggers"),
+        (test_participation_stats_cascades, "participation stats cascades"),
+        (test_route_query_budgets, "route query budgets"),
+        (test_startup_budget, "startup budget"),
+        (test_query_gate, "query gate"),
+        (test_principal_cache, "principal cache"),
+        (test_users_keyset_pagination, "users keyset pagination"),
+        (test_presentation_summary_names, "presentation summary names"),
+        (test_benchmark_percentile, "benchmark percentile"),
+        (test_query_cache_invalidation, "query cache invalidation"),
+        (test_querymaker_repeat, "querymaker repeat"),
+        (test_query_export_incomplete, "query export incomplete"),
+        (test_bulk_loader, "bulk loader")
     ]
 
     for test_func, test_name in tests:
@@ -2219,7 +2753,8 @@ def run_integrity_tests():
     return test_results
 
 if __name__ == "__main__":
-    with app.app_context():
+    # Not pre-warmed: the tables don't exist until reset_and_seed() runs
+    with create_app({"PREWARM": False}).app_context():
         reset_and_seed()
         test_results = run_integrity_tests()
         if test_results['failed'] > 0 or test_results['errors'] > 0:
@@ -1,5 +1,5 @@
-from sqlalchemy import DDL, event
-from main import db
+from sqlalchemy import DDL, event, text
+from models import db
 
 # Trigger 1: conductor_bonus
 trigger_1 = DDL("""
@@ -31,6 +31,230 @@ BEGIN
 END;
 """)
 
+# Triggers 3-7: keep course.enrolled_count equal to the number of enrollment rows.
+# MySQL does not fire triggers for rows removed by ON DELETE CASCADE, so deleting
+# a student (or the user behind it) gives back the spots explicitly before the
+# cascade removes the enrollments.
+trigger_3 = DDL("""
+CREATE TRIGGER enrollment_count_insert
+AFTER INSERT ON enrollment
+FOR EACH ROW
+BEGIN
+    UPDATE course SET enrolled_count = enrolled_count + 1 WHERE id = NEW.course_id;
+END;
+""")
+
+trigger_4 = DDL("""
+CREATE TRIGGER enrollment_count_delete
+AFTER DELETE ON enrollment
+FOR EACH ROW
+BEGIN
+    UPDATE course SET enrolled_count = enrolled_count - 1 WHERE id = OLD.course_id;
+END;
+""")
+
+trigger_5 = DDL("""
+CREATE TRIGGER enrollment_count_student_delete
+BEFORE DELETE ON student
+FOR EACH ROW
+BEGIN
+    UPDATE course c
+    JOIN enrollment e ON e.course_id = c.id
+    SET c.enrolled_count = c.enrolled_count - 1
+    WHERE e.student_id = OLD.id;
+END;
+""")
+
+trigger_6 = DDL("""
+CREATE TRIGGER enrollment_count_user_delete
+BEFORE DELETE ON user
+FOR EACH ROW
+BEGIN
+    UPDATE course c
+    JOIN enrollment e ON e.course_id = c.id
+    JOIN student s ON e.student_id = s.id
+    SET c.enrolled_count = c.enrolled_count - 1
+    WHERE s.user_id = OLD.id;
+END;
+""")
+
+trigger_7 = DDL("""
+CREATE TRIGGER enrollment_count_update
+AFTER UPDATE ON enrollment
+FOR EACH ROW
+BEGIN
+    IF NEW.course_id <> OLD.course_id THEN
+        UPDATE course SET enrolled_count = enrolled_count - 1 WHERE id = OLD.course_id;
+        UPDATE course SET enrolled_count = enrolled_count + 1 WHERE id = NEW.course_id;
+    END IF;
+END;
+""")
+
+
+# Triggers 8-12: keep student_participation_stats (count and last participation
+# date per student) in step with participation. Every student gets a row when it
+# is created, so "never participated" is just participation_count = 0.
+# Deleting a presentation cascades to participation without firing triggers,
+# so its participants are adjusted before the delete. The same goes for the
+# amphitheaters and dependencies whose deletes cascade down to presentation
+# (triggers 13-14).
+trigger_8 = DDL("""
+CREATE TRIGGER participation_stats_student_insert
+AFTER INSERT ON student
+FOR EACH ROW
+BEGIN
+    INSERT INTO student_participation_stats (student_id, participation_count, last_participation_date)
+    VALUES (NEW.id, 0, NULL);
+END;
+""")
+
+trigger_9 = DDL("""
+CREATE TRIGGER participation_stats_insert
+AFTER INSERT ON participation
+FOR EACH ROW
+BEGIN
+    UPDATE student_participation_stats sps
+    JOIN presentation p ON p.id = NEW.presentation_id
+    SET sps.participation_count = sps.participation_count + 1,
+        sps.last_participation_date = GREATEST(COALESCE(sps.last_participation_date, p.date), p.date)
+    WHERE sps.student_id = NEW.student_id;
+END;
+""")
+
+trigger_10 = DDL("""
+CREATE TRIGGER participation_stats_delete
+AFTER DELETE ON participation
+FOR EACH ROW
+BEGIN
+    UPDATE student_participation_stats sps
+    SET sps.participation_count = sps.participation_count - 1,
+        sps.last_participation_date = (
+            SELECT MAX(p.date)
+            FROM participation pa
+            JOIN presentation p ON p.id = pa.presentation_id
+            WHERE pa.student_id = OLD.student_id
+        )
+    WHERE sps.student_id = OLD.student_id;
+END;
+""")
+
+trigger_11 = DDL("""
+CREATE TRIGGER participation_stats_presentation_delete
+BEFORE DELETE ON presentation
+FOR EACH ROW
+BEGIN
+    UPDATE student_participation_stats sps
+    JOIN participation pa ON pa.student_id = sps.student_id AND pa.presentation_id = OLD.id
+    SET sps.participation_count = sps.participation_count - 1,
+        sps.last_participation_date = (
+            SELECT MAX(p.date)
+            FROM participation pa2
+            JOIN presentation p ON p.id = pa2.presentation_id
+            WHERE pa2.student_id = sps.student_id AND pa2.presentation_id <> OLD.id
+        );
+END;
+""")
+
+trigger_12 = DDL("""
+CREATE TRIGGER participation_stats_presentation_date
+AFTER UPDATE ON presentation
+FOR EACH ROW
+BEGIN
+    IF NEW.date <> OLD.date THEN
+        UPDATE student_participation_stats sps
+        JOIN participation pa ON pa.student_id = sps.student_id AND pa.presentation_id = NEW.id
+        SET sps.last_participation_date = (
+            SELECT MAX(p.date)
+            FROM participation pa2
+            JOIN presentation p ON p.id = pa2.presentation_id
+            WHERE pa2.student_id = sps.student_id
+        );
+    END IF;
+END;
+""")
+
+trigger_13 = DDL("""
+CREATE TRIGGER participation_stats_amphitheater_delete
+BEFORE DELETE ON amphitheater
+FOR EACH ROW
+BEGIN
+    UPDATE student_participation_stats sps
+    JOIN (
+        SELECT pa.student_id, COUNT(*) AS removed
+        FROM participation pa
+        JOIN presentation p ON p.id = pa.presentation_id
+        WHERE p.amphitheater_id = OLD.id
+        GROUP BY pa.student_id
+    ) gone ON gone.student_id = sps.student_id
+    SET sps.participation_count = sps.participation_count - gone.removed,
+        sps.last_participation_date = (
+            SELECT MAX(p2.date)
+            FROM participation pa2
+            JOIN presentation p2 ON p2.id = pa2.presentation_id
+            WHERE pa2.student_id = sps.student_id AND p2.amphitheater_id <> OLD.id
+        );
+END;
+""")
+
+trigger_14 = DDL("""
+CREATE TRIGGER participation_stats_dependency_delete
+BEFORE DELETE ON dependency
+FOR EACH ROW
+BEGIN
+    UPDATE student_participation_stats sps
+    JOIN (
+        SELECT pa.student_id, COUNT(*) AS removed
+        FROM participation pa
+        JOIN presentation p ON p.id = pa.presentation_id
+        JOIN amphitheater a ON a.id = p.amphitheater_id
+        WHERE a.dependency_id = OLD.id
+        GROUP BY pa.student_id
+    ) gone ON gone.student_id = sps.student_id
+    SET sps.participation_count = sps.participation_count - gone.removed,
+        sps.last_participation_date = (
+            SELECT MAX(p2.date)
+            FROM participation pa2
+            JOIN presentation p2 ON p2.id = pa2.presentation_id
+            JOIN amphitheater a2 ON a2.id = p2.amphitheater_id
+            WHERE pa2.student_id = sps.student_id AND a2.dependency_id <> OLD.id
+        );
+END;
+""")
+
+
+def reconcile_enrollment_counts():
+    """Recomputes course.enrolled_count from enrollment. Returns how many courses were off."""
+    with db.engine.begin() as conn:
+        result = conn.execute(text("""
+            UPDATE course c
+            LEFT JOIN (
+                SELECT course_id, COUNT(*) AS total
+                FROM enrollment
+                GROUP BY course_id
+            ) e ON e.course_id = c.id
+            SET c.enrolled_count = COALESCE(e.total, 0)
+            WHERE c.enrolled_count <> COALESCE(e.total, 0)
+        """))
+        return result.rowcount
+
+
+def reconcile_participation_stats():
+    """Rebuilds student_participation_stats from participation. Returns the affected row count."""
+    with db.engine.begin() as conn:
+        result = conn.execute(text("""
+            INSERT INTO student_participation_stats (student_id, participation_count, last_participation_date)
+            SELECT s.id, COUNT(p.id), MAX(p.date)
+            FROM student s
+            LEFT JOIN participation pa ON pa.student_id = s.id
+            LEFT JOIN presentation p ON p.id = pa.presentation_id
+            GROUP BY s.id
+            ON DUPLICATE KEY UPDATE
+                participation_count = VALUES(participation_count),
+                last_participation_date = VALUES(last_participation_date)
+        """))
+        return result.rowcount
+
+
 # Attach triggers to relevant tables AFTER they are created:
 
 # For conductor_bonus, attach to the conductor table
@@ -38,3 +262,23 @@ event.listen(db.metadata.tables['conductor'], 'after_create', trigger_1)
 
 # For gerencia_alocacao_instrumento, attach to the instrument table
 event.listen(db.metadata.tables['instrument'], 'after_create', trigger_2)
+
+# The enrollment counter triggers go on enrollment's after_create, when
+# course, student and user already exist
+for trigger in (trigger_3, trigger_4, trigger_5, trigger_6, trigger_7):
+    event.listen(db.metadata.tables['enrollment'], 'after_create', trigger)
+
+# The participation summary triggers go on participation's after_create, when
+# student, presentation, amphitheater and dependency already exist
+for trigger in (trigger_8, trigger_9, trigger_10, trigger_11, trigger_12, trigger_13, trigger_14):
+    event.listen(db.metadata.tables['participation'], 'after_create', trigger)
+
+
+if __name__ == "__main__":
+    from main import create_app
+
+    with create_app(web=False).app_context():
+        fixed = reconcile_enrollment_counts()
+        print(f"Enrollment counters reconciled ({fixed} courses corrected).")
+        affected = reconcile_participation_stats()
+        print(f"Participation summary rebuilt ({affected} rows affected).")
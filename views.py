@@ -1,6 +1,13 @@
-from main import db
+from models import db
 from sqlalchemy import text
 
+# Base tables each view reads, used to invalidate cached query results
+VIEW_TABLES = {
+    "vw_agenda_aulas": {"class", "course", "classroom", "dependency", "professor", "worker", "user"},
+    "vw_participacao_apresentacoes": {"user", "student", "student_participation_stats"},
+    "vw_cursos_com_vagas": {"course"},
+}
+
 def create_views():
     with db.engine.connect() as conn:
         conn.execute(text("DROP VIEW IF EXISTS vw_agenda_aulas"))
@@ -26,12 +33,10 @@ def create_views():
             SELECT 
                 s.id AS student_id,
                 u.name AS aluno,
-                COUNT(p.id) AS total_apresentacoes
-            FROM user u
-            JOIN student s ON u.id = s.user_id
-            LEFT JOIN participation part ON s.id = part.student_id
-            LEFT JOIN presentation p ON part.presentation_id = p.id
-            GROUP BY s.id, u.name
+                sps.participation_count AS total_apresentacoes
+            FROM student s
+            JOIN user u ON u.id = s.user_id
+            JOIN student_participation_stats sps ON sps.student_id = s.id
         """))
 
         conn.execute(text("DROP VIEW IF EXISTS vw_cursos_com_vagas"))
@@ -39,11 +44,9 @@ def create_views():
             CREATE VIEW vw_cursos_com_vagas AS
             SELECT 
                 c.name,
-                c.student_limit - COUNT(e.student_id) AS vagas
+                c.student_limit - c.enrolled_count AS vagas
             FROM course c
-            LEFT JOIN enrollment e ON c.id = e.course_id
-            GROUP BY c.student_limit, c.name
-            HAVING vagas > 0
+            WHERE c.enrolled_count < c.student_limit
         """))
 
 def drop_views():